@@ -0,0 +1,73 @@
+import pytz
+
+# Sales rollups: order count, quantity and revenue per period bucket (the
+# local start of an hour or a day) and per variant, service, category and
+# the shop as a whole. A RollupBatch adds up a batch of orders in memory;
+# its rows are added onto the stored totals, so batches can be applied in
+# any order and by several writers. Levels are 'variant', 'service',
+# 'category' and 'total' (key 0); periods are 'hour' and 'day'.
+
+
+class RollupBatch:
+    __slots__ = ("timezone", "totals", "names", "_buckets")
+
+    def __init__(self, timezone):
+        self.timezone = timezone
+        self.totals = {}   # (period, level, bucket, key) -> [orders, quantity, revenue]
+        self.names = {}    # (level, key) -> latest name
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self.totals)
+
+    def buckets(self, created_at):
+        # (hour, day) starts in local time, naive, for a naive UTC datetime.
+        # Every timezone offset is a multiple of 15 minutes, so orders in the
+        # same UTC quarter hour share their buckets.
+        quarter = created_at.replace(minute=created_at.minute - created_at.minute % 15, second=0, microsecond=0)
+        buckets = self._buckets.get(quarter)
+        if buckets is None:
+            local = pytz.utc.localize(quarter).astimezone(self.timezone).replace(tzinfo=None)
+            hour = local.replace(minute=0)
+            buckets = self._buckets[quarter] = (hour, hour.replace(hour=0))
+        return buckets
+
+    def add(self, created_at, items):
+        # items: dicts with the ids, names, quantity and subtotal of the
+        # order lines, as recorded by submit_order()
+        hour, day = self.buckets(created_at)
+        lines = {}
+        for item in items:
+            category_id = item["category_id"] or 0
+            for level, key, name in (
+                ("variant", item["variant_id"], f'{item["name"]} ({item["variant"]})'),
+                ("service", item["service_id"], item["name"]),
+                ("category", category_id, item["category"]),
+                ("total", 0, ""),
+            ):
+                line = lines.get((level, key))
+                if line is None:
+                    line = lines[(level, key)] = [1, 0, 0]
+                    self.names[(level, key)] = name
+                line[1] += item["quantity"]
+                line[2] += item["subtotal"]
+
+        totals = self.totals
+        for (level, key), line in lines.items():
+            for period, bucket in (("hour", hour), ("day", day)):
+                total = totals.get((period, level, bucket, key))
+                if total is None:
+                    totals[(period, level, bucket, key)] = list(line)
+                else:
+                    total[0] += line[0]
+                    total[1] += line[1]
+                    total[2] += line[2]
+
+    def rows(self):
+        names = self.names
+        for (period, level, bucket, key), (orders, quantity, revenue) in self.totals.items():
+            yield {
+                "period": period, "level": level, "bucket": bucket, "key": key,
+                "name": names[(level, key)], "orders": orders, "quantity": quantity, "revenue": revenue,
+            }
+
@@ -1,31 +1,121 @@
 from werkzeug.utils import secure_filename
 import os
-import requests
-from flask import Flask, render_template, request, redirect, url_for, session
+import math
+import hashlib
+import json
+import csv
+import io
+from collections import OrderedDict
+import threading
+import queue
+import itertools
+import atexit
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import time
+import gc
+from types import MappingProxyType
+from flask import Flask, render_template, stream_template, request, redirect, url_for, session, make_response, send_from_directory, jsonify, g, has_request_context, before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.dialects import postgresql, sqlite
+from search import SearchIndex
+from catalog import Catalog, CatalogDigest, row_hash
+from metrics import Metrics, SamplingProfiler, COUNT_BUCKETS
+from order_message import OrderMessageRenderer, load_template
+from analytics import RollupBatch
 from functools import wraps
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import pytz
+import re
+import click
+import gzip
+import mimetypes
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; uploads are then stored as-is
+    Image = None
+try:
+    import brotli
+except ImportError:  # Brotli is optional; only gzip copies are built then
+    brotli = None
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = 'your_secret_key_here'
 
 # Configure database path to be inside your project folder
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'services.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'services.db')
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Connection pool sized for threaded workers
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+    'pool_timeout': 30,
+}
+# Passed to SQLite connections only (see create_app()); the busy timeout lets
+# writers wait for each other instead of failing with "database is locked"
+app.config['SQLITE_CONNECT_ARGS'] = {'check_same_thread': False, 'timeout': 15}
+# Applied to every new SQLite connection. WAL lets storefront readers keep
+# reading while an admin write is in progress.
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,  # KiB, i.e. ~20 MB per connection
+    'temp_store': 'MEMORY',
+    'busy_timeout': 15000,
+}
+# Seconds between catalog version checks per worker (0 = every request)
+app.config['CATALOG_CHECK_INTERVAL'] = float(os.environ.get('CATALOG_CHECK_INTERVAL', 0))
+# A worker that finds a newer catalog version keeps serving its snapshot for
+# up to CATALOG_COALESCE_WINDOW seconds, then applies all changes made by
+# then in one go (admin pages apply them at once)
+app.config['CATALOG_COALESCE_WINDOW'] = float(os.environ.get('CATALOG_COALESCE_WINDOW', 0.5))
+# Cart quotes are advisory (submit_order prices the order again), so they
+# check at most once per QUOTE_CHECK_INTERVAL seconds
+app.config['QUOTE_CHECK_INTERVAL'] = float(os.environ.get('QUOTE_CHECK_INTERVAL', 1.0))
 CATEGORY_UPLOAD_FOLDER = os.path.join(basedir, 'static', 'categories')
 app.config['CATEGORY_UPLOAD_FOLDER'] = CATEGORY_UPLOAD_FOLDER
 
-os.makedirs(app.config['CATEGORY_UPLOAD_FOLDER'], exist_ok=True)
-
 # Image upload configuration
 UPLOAD_FOLDER = os.path.join(basedir, 'static', 'services')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-# Initialize database
-db = SQLAlchemy(app)
+# Widths of the resized JPEG/WebP copies generated for every upload
+IMAGE_WIDTHS = (160, 400, 800)
+IMAGE_MAX_WIDTH = 1200
+IMAGE_QUALITY = 80
+# Orders are queued in memory and written by a background thread in batches
+app.config['ORDER_FLUSH_INTERVAL'] = float(os.environ.get('ORDER_FLUSH_INTERVAL', 2.0))
+app.config['ORDERS_PER_PAGE'] = 25
+# Orders are sent as a wa.me link. Longer links are cut down to whole item
+# lines; ORDER_MESSAGE_TEMPLATE names a JSON file overriding message parts
+app.config['WHATSAPP_NUMBER'] = os.environ.get('WHATSAPP_NUMBER', '+918709625288')
+app.config['WHATSAPP_MAX_URL_LENGTH'] = int(os.environ.get('WHATSAPP_MAX_URL_LENGTH', 8000))
+app.config['ORDER_MESSAGE_TEMPLATE'] = os.environ.get('ORDER_MESSAGE_TEMPLATE')
+# Background image processing: worker processes and max queued uploads
+app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', 2))
+app.config['IMAGE_QUEUE_LIMIT'] = int(os.environ.get('IMAGE_QUEUE_LIMIT', 8))
+# Opt-in request metrics at /metrics; METRICS_PROFILE also samples request
+# stacks and keeps the slowest METRICS_PROFILE_SLOWEST for /metrics/profile
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED') == '1'
+app.config['METRICS_PROFILE'] = os.environ.get('METRICS_PROFILE') == '1'
+app.config['METRICS_PROFILE_INTERVAL'] = float(os.environ.get('METRICS_PROFILE_INTERVAL', 0.005))
+app.config['METRICS_PROFILE_SLOWEST'] = int(os.environ.get('METRICS_PROFILE_SLOWEST', 20))
+# Uncached pages are sent as they render, in chunks of about
+# STREAM_CHUNK_SIZE bytes, and go into the page cache once complete
+app.config['STREAM_PAGES'] = os.environ.get('STREAM_PAGES', '1') == '1'
+app.config['STREAM_CHUNK_SIZE'] = int(os.environ.get('STREAM_CHUNK_SIZE', 8 * 1024))
+# Build the catalog snapshot in create_app(), i.e. once in a preloading master
+app.config['WARM_CATALOG'] = os.environ.get('WARM_CATALOG') == '1'
+
+# Initialize database (bound to the app in create_app())
+db = SQLAlchemy()
 
 # Database Models
 class Category(db.Model):
@@ -37,7 +127,7 @@ class Category(db.Model):
 class Subcategory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
     services = db.relationship('Service', backref='subcategory', lazy=True, cascade="all, delete-orphan")
 
 # In your app.py, modify the Service model and initialization code:
@@ -47,7 +137,7 @@ class Variant(db.Model):
     name = db.Column(db.String(100), nullable=False)  # e.g. "30g", "100g"
     price = db.Column(db.Integer, nullable=False)
     unit = db.Column(db.String(50), nullable=False, default="per service")  # Add this line
-    service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=False)
+    service_id = db.Column(db.Integer, db.ForeignKey('service.id'), nullable=False, index=True)
     available = db.Column(db.Boolean, default=True)
 
 # Modify Service model (remove price and unit fields)
@@ -56,7 +146,7 @@ class Service(db.Model):
     name = db.Column(db.String(200), nullable=False)
     available = db.Column(db.Boolean, default=True)
     description = db.Column(db.Text, nullable=True)
-    subcategory_id = db.Column(db.Integer, db.ForeignKey('subcategory.id'), nullable=False)
+    subcategory_id = db.Column(db.Integer, db.ForeignKey('subcategory.id'), nullable=False, index=True)
     image_filename = db.Column(db.String(100), nullable=True)
     variants = db.relationship('Variant', backref='service', lazy=True, cascade="all, delete-orphan")
 
@@ -64,108 +154,1598 @@ class ShopStatus(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     is_open = db.Column(db.Boolean, default=True)
     message = db.Column(db.String(200), default="We're currently closed. Please come back during our business hours.")
-# Then in your initialization code
-with app.app_context():
+
+# Opening windows in Asia/Kolkata time; a window whose closing time is not
+# after its opening time runs past midnight. No rows means no schedule.
+class BusinessHours(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    weekday = db.Column(db.Integer, nullable=False, index=True)  # 0 = Monday
+    opens = db.Column(db.Time, nullable=False)
+    closes = db.Column(db.Time, nullable=False)
+
+class Order(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, index=True)  # UTC
+    name = db.Column(db.String(100), nullable=False)
+    phone = db.Column(db.String(20), nullable=False)
+    address = db.Column(db.String(200), nullable=False)
+    payment_mode = db.Column(db.String(50), nullable=True)
+    total = db.Column(db.Integer, nullable=False)
+    items = db.relationship('OrderItem', backref='order', lazy=True, cascade="all, delete-orphan")
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    # Catalog ids plus a copy of the names/prices at order time
+    category_id = db.Column(db.Integer, nullable=True)
+    subcategory_id = db.Column(db.Integer, nullable=True)
+    service_id = db.Column(db.Integer, nullable=False)
+    variant_id = db.Column(db.Integer, nullable=False)
+    category = db.Column(db.String(100), nullable=False)
+    subcategory = db.Column(db.String(100), nullable=False)
+    service_name = db.Column(db.String(200), nullable=False)
+    variant_name = db.Column(db.String(100), nullable=False)
+    unit = db.Column(db.String(50), nullable=True)
+    price = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    subtotal = db.Column(db.Integer, nullable=False)
+
+# Sales totals per hour and day (local start, Asia/Kolkata) for every
+# variant, service and category plus the shop ('total', key 0), kept by the
+# order writer in the same transaction as the orders
+class SalesRollup(db.Model):
+    period = db.Column(db.String(8), primary_key=True)  # 'hour' or 'day'
+    level = db.Column(db.String(16), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    key = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(300), nullable=False)  # latest name seen in an order
+    orders = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    revenue = db.Column(db.Integer, nullable=False)
+
+# Single-row generation counter shared by all worker processes
+class CatalogVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+# Catalog change journal: one entry per category, subcategory, service or
+# variant added, updated or deleted, and per shop status change, written
+# with the version bump of the commit that made it. seq numbers entries in
+# the order they were written; version groups them by commit. A 'reload'
+# entry (kind 'catalog') stands for changes not tracked row by row.
+class CatalogChange(db.Model):
+    __table_args__ = {'sqlite_autoincrement': True}
+    seq = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False)  # UTC
+    kind = db.Column(db.String(16), nullable=False)  # 'categories' ... 'variants', 'shop' or 'catalog'
+    row_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(8), nullable=False)  # 'add', 'update', 'delete' or 'reload'
+    name = db.Column(db.String(200), nullable=True)
+    fields = db.Column(db.String(200), nullable=True)  # columns changed by an update
+    source = db.Column(db.String(64), nullable=True)  # endpoint that made the change
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+# Schema changes that create_all() does not apply to existing tables
+MIGRATIONS = [
+    "CREATE INDEX IF NOT EXISTS ix_subcategory_category_id ON subcategory (category_id)",
+    "CREATE INDEX IF NOT EXISTS ix_service_subcategory_id ON service (subcategory_id)",
+    "CREATE INDEX IF NOT EXISTS ix_variant_service_id ON variant (service_id)",
+]
+
+def run_migrations():
+    for statement in MIGRATIONS:
+        db.session.execute(db.text(statement))
+    db.session.commit()
+
+def init_db():
+    # Create missing tables and indexes plus the single-row tables; safe to rerun
     db.create_all()
+    run_migrations()
 
     # Initialize shop status if not exists
     if not ShopStatus.query.first():
         db.session.add(ShopStatus(is_open=True))
         db.session.commit()
 
-    if not Category.query.first():
-        # Create test categories
-        categories = [
-            Category(name="Cleaning Services", image_filename="clean.jpg"),
-            Category(name="Repair Services", image_filename="repair.jpg"),
-            Category(name="Beauty Services", image_filename="beauty.jpg")
-        ]
-        db.session.add_all(categories)
-
-        # Create test subcategories
-        subcategories = [
-            Subcategory(name="Home Cleaning", category=categories[0]),
-            Subcategory(name="Office Cleaning", category=categories[0]),
-            Subcategory(name="Appliance Repair", category=categories[1]),
-            Subcategory(name="Salon Services", category=categories[2])
-        ]
-        db.session.add_all(subcategories)
-
-        # Create test services
-        services = [
-            Service(name="Basic Cleaning", description="Basic cleaning includes dusting, vacuuming, and bathroom cleaning", subcategory=subcategories[0], image_filename=None),
-            Service(name="Deep Cleaning", description="Deep cleaning includes all basic cleaning plus kitchen deep clean", subcategory=subcategories[0], image_filename=None)
-        ]
-        db.session.add_all(services)
-
-        # Create test variants
-        variants = [
-            Variant(name="1 Bedroom", price=1500, available=True, service=services[0]),
-            Variant(name="2 Bedroom", price=2500, available=True, service=services[0]),
-            Variant(name="Standard", price=3000, available=True, service=services[1]),
-            Variant(name="Premium", price=4000, available=True, service=services[1])
-        ]
-        db.session.add_all(variants)
+    if not CatalogVersion.query.first():
+        db.session.add(CatalogVersion(version=0))
         db.session.commit()
 
+def seed_db():
+    # Demo catalog for an empty database
+    if Category.query.first():
+        return False
+    # Create test categories
+    categories = [
+        Category(name="Cleaning Services", image_filename="clean.jpg"),
+        Category(name="Repair Services", image_filename="repair.jpg"),
+        Category(name="Beauty Services", image_filename="beauty.jpg")
+    ]
+    db.session.add_all(categories)
+
+    # Create test subcategories
+    subcategories = [
+        Subcategory(name="Home Cleaning", category=categories[0]),
+        Subcategory(name="Office Cleaning", category=categories[0]),
+        Subcategory(name="Appliance Repair", category=categories[1]),
+        Subcategory(name="Salon Services", category=categories[2])
+    ]
+    db.session.add_all(subcategories)
+
+    # Create test services
+    services = [
+        Service(name="Basic Cleaning", description="Basic cleaning includes dusting, vacuuming, and bathroom cleaning", subcategory=subcategories[0], image_filename=None),
+        Service(name="Deep Cleaning", description="Deep cleaning includes all basic cleaning plus kitchen deep clean", subcategory=subcategories[0], image_filename=None)
+    ]
+    db.session.add_all(services)
+
+    # Create test variants
+    variants = [
+        Variant(name="1 Bedroom", price=1500, available=True, service=services[0]),
+        Variant(name="2 Bedroom", price=2500, available=True, service=services[0]),
+        Variant(name="Standard", price=3000, available=True, service=services[1]),
+        Variant(name="Premium", price=4000, available=True, service=services[1])
+    ]
+    db.session.add_all(variants)
+    commit_catalog()
+    return True
+
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Request metrics
+# With METRICS_ENABLED every request records its latency, the number and time
+# of its SQL queries and its template render time, labelled by endpoint; the
+# page and catalog caches count hits and misses. The hooks are only installed
+# when enabled, so the default request path is unchanged.
+metrics = Metrics(prefix='ranchi_mess_')
+metrics.describe('requests_total', 'counter', 'Requests handled, by endpoint, method and status')
+metrics.describe('request_duration_seconds', 'histogram', 'Request latency in seconds')
+metrics.describe('request_sql_queries', 'histogram', 'SQL queries executed per request', COUNT_BUCKETS)
+metrics.describe('request_sql_seconds', 'histogram', 'Time spent in SQL queries per request')
+metrics.describe('request_template_seconds', 'histogram', 'Time spent rendering templates per request')
+metrics.describe('template_render_seconds', 'histogram', 'Render time per template')
+metrics.describe('cache_requests_total', 'counter', 'Cache lookups, by cache and result')
+metrics.describe('cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits')
+metrics.describe('catalog_refreshes_total', 'counter', 'Catalog snapshot rebuilds')
+metrics.describe('catalog_journal_applies_total', 'counter', 'Catalog snapshot updates from the change journal')
+metrics.describe('catalog_version', 'gauge', 'Catalog version of the snapshot served by this worker')
+metrics.describe('order_queue_length', 'gauge', 'Orders waiting for the background writer')
+profiler = SamplingProfiler(
+    interval=app.config['METRICS_PROFILE_INTERVAL'],
+    keep=app.config['METRICS_PROFILE_SLOWEST']
+)
+
+def count_cache(cache, hit):
+    if app.config['METRICS_ENABLED']:
+        metrics.inc('cache_requests_total', (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+def start_request_metrics():
+    g.request_metrics = {"start": time.perf_counter(), "sql_queries": 0, "sql_seconds": 0.0, "template_seconds": 0.0}
+    if app.config['METRICS_PROFILE']:
+        profiler.start()
+
+def record_request_metrics(response):
+    stats = g.get('request_metrics')
+    if stats is None:
+        return response
+    labels = (('endpoint', request.endpoint or 'unmatched'), ('method', request.method))
+    status = str(response.status_code)
+    label = f"{request.method} {request.path}"
+    if response.is_streamed:
+        # Streamed pages render while the body is sent, i.e. after this hook
+        # (template_rendered fires at the end of the stream), so the request
+        # keeps collecting until the response is closed
+        response.call_on_close(lambda: _record_request(stats, labels, status, label))
+    else:
+        g.pop('request_metrics')
+        _record_request(stats, labels, status, label)
+    return response
+
+def _record_request(stats, labels, status, label):
+    elapsed = time.perf_counter() - stats["start"]
+    metrics.inc('requests_total', labels + (('status', status),))
+    metrics.observe('request_duration_seconds', labels, elapsed)
+    metrics.observe('request_sql_queries', labels, stats["sql_queries"])
+    metrics.observe('request_sql_seconds', labels, stats["sql_seconds"])
+    metrics.observe('request_template_seconds', labels, stats["template_seconds"])
+    if app.config['METRICS_PROFILE']:
+        profiler.finish(label, elapsed)
+
+def _sql_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+def _sql_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context() and 'request_metrics' in g:
+        g.request_metrics["sql_queries"] += 1
+        g.request_metrics["sql_seconds"] += elapsed
+
+def _sql_failed(context):
+    # The query raised, so after_cursor_execute does not fire for it
+    connection = context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+def _template_started(sender, template, context, **extra):
+    if 'request_metrics' in g:
+        g.request_metrics["template_started"] = time.perf_counter()
+
+def _template_finished(sender, template, context, **extra):
+    stats = g.get('request_metrics')
+    if stats is None or "template_started" not in stats:
+        return
+    elapsed = time.perf_counter() - stats.pop("template_started")
+    stats["template_seconds"] += elapsed
+    metrics.observe('template_render_seconds', (('template', template.name),), elapsed)
+
+def install_metrics():
+    # Called from create_app(). Timing starts before any other before_request
+    # hook (catalog sync included) and ends after every after_request hook,
+    # or once the body is sent for streamed responses.
+    app.before_request_funcs.setdefault(None, []).insert(0, start_request_metrics)
+    app.after_request_funcs.setdefault(None, []).insert(0, record_request_metrics)
+    event.listen(Engine, 'before_cursor_execute', _sql_started)
+    event.listen(Engine, 'after_cursor_execute', _sql_finished)
+    event.listen(Engine, 'handle_error', _sql_failed)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+
+# Static assets
+# Templates link static files through static_url(), which appends a content
+# hash (?v=...). Versioned URLs are served with a far-future immutable
+# Cache-Control, and precompressed .br/.gz copies built by
+# 'flask build-assets' are sent to clients that accept them.
+STATIC_MAX_AGE = 365 * 24 * 3600
+COMPRESSIBLE_EXTENSIONS = {'css', 'js', 'svg', 'json', 'txt', 'html'}
+_asset_hashes = {}
+
+def asset_version(filename):
+    # Content hash of a file under static/, cached until its mtime or size changes
+    path = os.path.join(app.static_folder, filename)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    cached = _asset_hashes.get(path)
+    if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+        return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    _asset_hashes[path] = ((stat.st_mtime_ns, stat.st_size), digest)
+    return digest
+
+@app.template_global()
+def static_url(filename):
+    version = asset_version(filename)
+    url = f"/static/{filename}"
+    return f"{url}?v={version}" if version else url
+
+def serve_static(filename):
+    response = None
+    if filename.rsplit('.', 1)[-1].lower() in COMPRESSIBLE_EXTENSIONS:
+        source = os.path.join(app.static_folder, filename)
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding not in request.accept_encodings:
+                continue
+            compressed = source + suffix
+            if os.path.exists(compressed) and os.path.exists(source) \
+                    and os.path.getmtime(compressed) >= os.path.getmtime(source):
+                response = send_from_directory(
+                    app.static_folder, filename + suffix,
+                    mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                )
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = app.send_static_file(filename)
+        response.vary.add('Accept-Encoding')
+    else:
+        response = app.send_static_file(filename)
+
+    if request.args.get('v'):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = serve_static
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint static files and write precompressed .gz/.br copies."""
+    for root, _, files in os.walk(app.static_folder):
+        for name in sorted(files):
+            if name.endswith(('.gz', '.br')):
+                continue
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, app.static_folder).replace(os.sep, '/')
+            click.echo(f"{filename} -> {asset_version(filename)}")
+            if name.rsplit('.', 1)[-1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9))
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+
+# Image pipeline
+# Uploads are re-encoded as a metadata-free JPEG (capped at IMAGE_MAX_WIDTH)
+# plus <name>-<width>.jpg/.webp copies for srcset. Without Pillow the raw
+# upload is stored and the templates fall back to the single image.
+RESIZED_IMAGE_RE = re.compile(r'-\d+\.(jpg|webp)$')
+
+def resized_filename(filename, width, ext):
+    return f"{filename.rsplit('.', 1)[0]}-{width}.{ext}"
+
+def _scaled(image, width):
+    if image.width <= width:
+        return image
+    return image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+
+def _save_atomic(image, path, image_format, **options):
+    # Write next to the target and swap it in so readers never see a partial file
+    tmp_path = path + '.tmp'
+    image.save(tmp_path, image_format, **options)
+    os.replace(tmp_path, path)
+
+def save_image(source, folder, filename, resized_only=False):
+    # resized_only regenerates the copies from an image already stored as
+    # filename and leaves that file as it is (re-encoding it would lose
+    # quality on every run)
+    filepath = os.path.join(folder, filename)
+    if Image is None:
+        shutil.copyfile(source, filepath + '.tmp')
+        os.replace(filepath + '.tmp', filepath)
+        return
+
+    with Image.open(source) as original:
+        # Apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    image.info = {}
+
+    # Resized copies first, so the main file only changes once they are ready
+    for width in IMAGE_WIDTHS:
+        resized = _scaled(image, width)
+        _save_atomic(resized, os.path.join(folder, resized_filename(filename, width, 'jpg')),
+                     'JPEG', quality=IMAGE_QUALITY, optimize=True, progressive=True)
+        _save_atomic(resized, os.path.join(folder, resized_filename(filename, width, 'webp')),
+                     'WEBP', quality=IMAGE_QUALITY, method=6)
+    if not resized_only:
+        _save_atomic(_scaled(image, IMAGE_MAX_WIDTH), filepath,
+                     'JPEG', quality=IMAGE_QUALITY, optimize=True, progressive=True)
+
+def resized_up_to_date(folder, filename):
+    # Whether every resized copy exists and is newer than the image itself
+    mtime = os.path.getmtime(os.path.join(folder, filename))
+    for width in IMAGE_WIDTHS:
+        for ext in ('jpg', 'webp'):
+            path = os.path.join(folder, resized_filename(filename, width, ext))
+            if not os.path.exists(path) or os.path.getmtime(path) < mtime:
+                return False
+    return True
+
+def process_upload(upload_path, folder, filename):
+    # Runs in the image worker pool
+    try:
+        save_image(upload_path, folder, filename)
+    finally:
+        os.remove(upload_path)
+
+def remove_image(folder, filename):
+    # Delete an image together with its resized copies
+    names = [filename]
+    for width in IMAGE_WIDTHS:
+        names += [resized_filename(filename, width, 'jpg'), resized_filename(filename, width, 'webp')]
+    for name in names:
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+def image_widths(folder, filename):
+    # Widths whose resized copies exist on disk (empty for unprocessed images)
+    if not filename:
+        return ()
+    return tuple(
+        width for width in IMAGE_WIDTHS
+        if os.path.exists(os.path.join(folder, resized_filename(filename, width, 'webp')))
+    )
+
+# Upload jobs: the request only stores the raw upload and queues it; the
+# done-callback points the category/service at the new image and bumps the
+# catalog once the resized files have been swapped in. An older image under
+# another name is only deleted then, so a failed or refused upload leaves
+# the current image in place.
+_image_pool = None
+_image_jobs = OrderedDict()
+_image_jobs_lock = threading.Lock()
+IMAGE_JOB_HISTORY = 50
+
+class ImageQueueFull(Exception):
+    pass
+
+def _image_job_done(job, future):
+    error = future.exception()
+    if error is None:
+        try:
+            with app.app_context():
+                model = Service if job["kind"] == "service" else Category
+                target = db.session.get(model, job["id"])
+                if target is not None:
+                    replaced = target.image_filename
+                    target.image_filename = job["filename"]
+                    commit_catalog()
+                    if replaced and replaced != job["filename"]:
+                        remove_image(job["folder"], replaced)
+        except Exception as e:
+            error = e
+    job["status"] = "failed" if error else "done"
+    job["error"] = str(error) if error else None
+    job["finished_at"] = datetime.now(pytz.timezone("Asia/Kolkata"))
+
+def _image_queue_full(key):
+    # Called with _image_jobs_lock held
+    pending = [job for job in _image_jobs.values() if job["status"] == "pending"]
+    return len(pending) >= app.config['IMAGE_QUEUE_LIMIT'] or any(job["key"] == key for job in pending)
+
+def image_queue_full(kind=None, target_id=None):
+    # For routes that must not save anything when the upload cannot be queued
+    with _image_jobs_lock:
+        return _image_queue_full((kind, target_id))
+
+def queue_image(file, kind, target_id, folder, filename):
+    global _image_pool
+    with _image_jobs_lock:
+        key = (kind, target_id)
+        if _image_queue_full(key):
+            raise ImageQueueFull()
+
+        upload_path = os.path.join(folder, f".upload-{uuid.uuid4().hex}")
+        file.save(upload_path)
+
+        if _image_pool is None:
+            _image_pool = ProcessPoolExecutor(max_workers=app.config['IMAGE_WORKERS'])
+        job = {
+            "key": key,
+            "kind": kind,
+            "id": target_id,
+            "folder": folder,
+            "filename": filename,
+            "status": "pending",
+            "error": None,
+            "submitted_at": datetime.now(pytz.timezone("Asia/Kolkata")),
+            "finished_at": None
+        }
+        _image_jobs.pop(key, None)
+        _image_jobs[key] = job
+        while len(_image_jobs) > IMAGE_JOB_HISTORY:
+            _image_jobs.popitem(last=False)
+        future = _image_pool.submit(process_upload, upload_path, folder, filename)
+    future.add_done_callback(lambda f: _image_job_done(job, f))
+    return job
+
+def image_jobs():
+    with _image_jobs_lock:
+        return list(reversed(_image_jobs.values()))
+
+@app.template_global()
+def image_srcset(folder, filename, widths, ext='jpg'):
+    # Resized copies are written together with the main file, so they share its version
+    version = asset_version(f"{folder}/{filename}")
+    query = f"?v={version}" if version else ""
+    return ", ".join(f"/static/{folder}/{resized_filename(filename, width, ext)}{query} {width}w" for width in widths)
+
+@app.cli.command('process-images')
+def process_images_command():
+    """Generate missing or outdated resized and WebP copies of stored images."""
+    if Image is None:
+        raise click.ClickException("Pillow is not installed")
+    create_app()
+    processed = 0
+    for folder in (app.config['UPLOAD_FOLDER'], app.config['CATEGORY_UPLOAD_FOLDER']):
+        for filename in sorted(os.listdir(folder)):
+            if not allowed_file(filename) or RESIZED_IMAGE_RE.search(filename):
+                continue
+            try:
+                if resized_up_to_date(folder, filename):
+                    continue
+                save_image(os.path.join(folder, filename), folder, filename, resized_only=True)
+            except OSError as e:
+                click.echo(f"Skipped {filename}: {e}")
+                continue
+            processed += 1
+            click.echo(f"Processed {filename}")
+
+    if processed:
+        # Let running workers pick up the new srcset widths
+        journal_catalog()
+        db.session.commit()
+    click.echo(f"{processed} images processed")
+
+# Columns of the rows Catalog.build() takes, per kind; categories and
+# services get their image widths and version appended
+CATALOG_ROW_COLUMNS = {
+    'categories': (Category, (Category.id, Category.name, Category.image_filename)),
+    'subcategories': (Subcategory, (Subcategory.category_id, Subcategory.id, Subcategory.name)),
+    'services': (Service, (
+        Service.subcategory_id, Service.id, Service.name, Service.available,
+        Service.description, Service.image_filename
+    )),
+    'variants': (Variant, (
+        Variant.service_id, Variant.id, Variant.name, Variant.price, Variant.unit, Variant.available
+    )),
+}
+CATALOG_IMAGE_FOLDERS = {'categories': 'CATEGORY_UPLOAD_FOLDER', 'services': 'UPLOAD_FOLDER'}
+
+def load_catalog_rows(kind, ids=None, parent_ids=None):
+    # (id, row) pairs of one kind: all of them, just ids, or those under
+    # parent_ids. Plain column queries, so no ORM objects stay behind in the
+    # session.
+    model, columns = CATALOG_ROW_COLUMNS[kind]
+    key, ids = (model.id, ids) if parent_ids is None else (columns[0], parent_ids)
+    if ids is None:
+        statements = [db.select(*columns)]
+    else:
+        ids = list(ids)
+        statements = [
+            db.select(*columns).where(key.in_(ids[start:start + IMPORT_CHUNK_SIZE]))
+            for start in range(0, len(ids), IMPORT_CHUNK_SIZE)
+        ]
+    folder = CATALOG_IMAGE_FOLDERS.get(kind)
+    for statement in statements:
+        for row in db.session.execute(statement):
+            if folder:
+                yield row.id, tuple(row) + (
+                    image_widths(app.config[folder], row.image_filename),
+                    asset_version(f"{kind}/{row.image_filename}") if row.image_filename else None
+                )
+            else:
+                yield row.id, tuple(row)
+
+def load_services_data():
+    return Catalog.build(
+        *((row for _, row in load_catalog_rows(kind)) for kind in CATALOG_KINDS),
+        compile_category=order_messages.compile_category,
+        compile_item=order_messages.compile_item
+    )
+
+# Catalog snapshot cache
+# Read paths (storefront, orders, admin panel) share one immutable snapshot of
+# the catalog. Admin routes call commit_catalog(), which journals the rows
+# changed with the version bump and patches the snapshot with just those
+# rows. Other workers notice the bumped CatalogVersion row in sync_catalog()
+# and apply the journal entries since their own version the same way.
+_catalog_lock = threading.RLock()
+_catalog = {"version": None, "services_data": None, "shop_status": None, "checked_at": 0.0, "pending_since": None}
+# Service search index, updated in place for changed services on every reload
+search_index = SearchIndex()
+SEARCH_MAX_RESULTS = 50
+# Row digests of recent versions, used to answer /api/catalog?since=
+_catalog_history = OrderedDict()
+CATALOG_HISTORY_SIZE = 20
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+# WhatsApp order message renderer, configured in create_app(). The catalog
+# stores its precompiled pieces with every category and variant.
+order_messages = OrderMessageRenderer(phone=app.config['WHATSAPP_NUMBER'])
+
+# Rows per JSON chunk of /api/catalog
+CATALOG_CHUNK_ROWS = 500
+
+def catalog_delta(services_data, version, since=None, touched=None):
+    # /api/catalog as JSON text chunks: the full catalog, or the rows changed
+    # and the ids deleted since a recent version. Versions older than the
+    # digests kept can be answered from the journal: touched holds the ids
+    # per kind it lists since then (see journal_touched()).
+    previous = _catalog_history.get(since)
+    if previous is None and touched is None:
+        # Unknown or too old a version: send the full catalog
+        header = {"version": version, "full": True}
+    elif previous is None:
+        header = {"version": version, "since": since, "full": False, "deleted": {
+            kind: sorted(row_id for row_id in touched[kind] if not services_data.contains(kind, row_id))
+            for kind in CATALOG_KINDS
+        }}
+    else:
+        header = {"version": version, "since": since, "full": False, "deleted": {
+            kind: [row_id for row_id in previous.ids(kind) if not services_data.contains(kind, row_id)]
+            for kind in CATALOG_KINDS
+        }}
+    yield json.dumps(header, separators=(',', ':'))[:-1]
+
+    for kind in CATALOG_KINDS:
+        if previous is None and touched is not None:
+            rows = filter(None, (services_data.entity(kind, row_id) for row_id in sorted(touched[kind])))
+        else:
+            rows = (row for _, row in services_data.iter_entities(kind))
+        if previous is not None:
+            rows = (row for row in rows if previous.row_hash(kind, row["id"]) != row_hash(row))
+        yield f',"{kind}":['
+        batch, separator = [], ''
+        for row in rows:
+            batch.append(row)
+            if len(batch) == CATALOG_CHUNK_ROWS:
+                yield separator + json.dumps(batch, separators=(',', ':'))[1:-1]
+                batch, separator = [], ','
+        if batch:
+            yield separator + json.dumps(batch, separators=(',', ':'))[1:-1]
+        yield ']'
+    yield '}'
+
+def current_catalog_version():
+    return db.session.execute(db.select(CatalogVersion.version)).scalar() or 0
+
+def install_catalog(version, services_data, digest):
+    _catalog["version"] = version
+    _catalog["services_data"] = services_data
+    _catalog["checked_at"] = time.monotonic()
+    _catalog["pending_since"] = None
+    _catalog_history[version] = digest
+    while len(_catalog_history) > CATALOG_HISTORY_SIZE:
+        _catalog_history.popitem(last=False)
+    with _page_cache_lock:
+        _page_cache.clear()
+
+def refresh_catalog():
+    with _catalog_lock:
+        # Read the version before the data: a concurrent edit can then only
+        # cause one extra reload, never a stale snapshot tagged as current
+        version = current_catalog_version()
+        services_data = load_services_data()
+        entities = services_data.entities()
+        _catalog["shop_status"] = _freeze(load_shop_status())
+        search_index.update(entities)
+        if app.config['METRICS_ENABLED']:
+            metrics.inc('catalog_refreshes_total')
+        install_catalog(version, services_data, CatalogDigest(entities))
+    return services_data
+
 def get_services_data():
-    # Clear any existing SQLAlchemy session to ensure fresh data
-    #db.session.expire_all()
-
-    # Force reload all relationships
-    categories = Category.query.options(
-        db.joinedload(Category.subcategories)
-        .joinedload(Subcategory.services)
-        .joinedload(Service.variants)
+    services_data = _catalog["services_data"]
+    count_cache('catalog', services_data is not None)
+    if services_data is None:
+        services_data = refresh_catalog()
+    return services_data
+
+# Shop status
+# The status row and business hours are loaded with the catalog snapshot, so
+# deciding between the menu and the closed page is an in-memory time check.
+# The admin status routes save through commit_catalog(), which pushes the
+# change to this worker at once and to the others via the version row.
+SHOP_TIMEZONE = pytz.timezone("Asia/Kolkata")
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+HOURS_RE = re.compile(r'^(\d{1,2}:\d{2})\s*-\s*(\d{1,2}:\d{2})$')
+
+def load_shop_status():
+    status = ShopStatus.query.first()
+    hours = {}
+    for row in BusinessHours.query.order_by(BusinessHours.weekday, BusinessHours.opens):
+        hours.setdefault(row.weekday, []).append(
+            (row.opens.hour * 60 + row.opens.minute, row.closes.hour * 60 + row.closes.minute)
+        )
+    return {
+        "is_open": status.is_open if status else True,
+        "message": status.message if status else ShopStatus.message.default.arg,
+        "hours": hours
+    }
+
+def get_shop_status():
+    if _catalog["shop_status"] is None:
+        refresh_catalog()
+    return _catalog["shop_status"]
+
+def within_business_hours(hours, now):
+    if not hours:
+        return True
+    minute = now.hour * 60 + now.minute
+    weekday = now.weekday()
+    for opens, closes in hours.get(weekday, ()):
+        if opens <= minute < closes or (closes <= opens and minute >= opens):
+            return True
+    # Overnight windows that started the day before
+    for opens, closes in hours.get((weekday - 1) % 7, ()):
+        if closes <= opens and minute < closes:
+            return True
+    return False
+
+def shop_is_open(now=None):
+    status = get_shop_status()
+    if not status["is_open"]:
+        return False
+    return within_business_hours(status["hours"], now or datetime.now(SHOP_TIMEZONE))
+
+def format_hours(windows):
+    return ", ".join(
+        f"{opens // 60:02d}:{opens % 60:02d}-{closes // 60:02d}:{closes % 60:02d}"
+        for opens, closes in windows
+    )
+
+def parse_hours(text):
+    # "11:00-15:00, 19:00-23:30" -> [(time, time), ...]; raises ValueError
+    windows = []
+    for part in filter(None, (part.strip() for part in text.split(','))):
+        match = HOURS_RE.match(part)
+        if not match:
+            raise ValueError(part)
+        try:
+            opens, closes = (datetime.strptime(group, '%H:%M').time() for group in match.groups())
+        except ValueError:
+            raise ValueError(part) from None
+        windows.append((opens, closes))
+    return windows
+
+# Rendered storefront pages and catalog JSON keyed by catalog version / shop
+# status, least recently used first
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+PAGE_CACHE_SIZE = 32
+
+def store_page(key, body):
+    entry = {
+        "body": body,
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "last_modified": datetime.now(timezone.utc).replace(microsecond=0)
+    }
+    with _page_cache_lock:
+        _page_cache[key] = entry
+        _page_cache.move_to_end(key)
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+    return entry
+
+def stream_page(key, chunks):
+    # Send the chunks as they are produced, joined into pieces of about
+    # STREAM_CHUNK_SIZE, then cache the page unless the catalog was reloaded
+    # meanwhile (the reload clears the cache and the page may be stale)
+    version = _catalog["version"]
+    chunk_size = app.config['STREAM_CHUNK_SIZE']
+    parts, pending, size = [], [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            parts.append(''.join(pending).encode('utf-8'))
+            pending, size = [], 0
+            yield parts[-1]
+    if pending:
+        parts.append(''.join(pending).encode('utf-8'))
+        yield parts[-1]
+    if _catalog["version"] == version:
+        store_page(key, b''.join(parts))
+
+def cached_page(key, render, mimetype='text/html'):
+    # render() returns the page as a str or as an iterable of str chunks
+    with _page_cache_lock:
+        entry = _page_cache.get(key)
+        if entry is not None:
+            _page_cache.move_to_end(key)
+    count_cache('page', entry is not None)
+    if entry is None:
+        body = render()
+        if not isinstance(body, str):
+            if app.config['STREAM_PAGES']:
+                # The first byte goes out before the rest is rendered; the
+                # ETag is only known, and sent, once the page is cached
+                response = app.response_class(stream_page(key, body), mimetype=mimetype)
+                response.cache_control.no_cache = True
+                return response
+            body = ''.join(body)
+        entry = store_page(key, body.encode('utf-8'))
+
+    response = make_response(entry["body"])
+    response.mimetype = mimetype
+    response.set_etag(entry["etag"])
+    response.last_modified = entry["last_modified"]
+    # Let browsers keep the page but revalidate it on every visit
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Catalog change journal
+# Flushes note the catalog rows they add, change or delete (deletes include
+# the rows removed with their parent) in the session; commit_catalog() writes
+# them as CatalogChange entries with the version bump. Readers load just the
+# rows named by the entries since their version and patch their snapshot,
+# its row digest and the search index with them. Versions with no entries
+# (bumped by bulk statements, which bypass the ORM, or by hand), a 'reload'
+# entry or entries already pruned make them reload in full instead.
+CATALOG_MODEL_KINDS = {
+    Category: 'categories', Subcategory: 'subcategories', Service: 'services', Variant: 'variants',
+    ShopStatus: 'shop', BusinessHours: 'shop',
+}
+# Commits changing more rows than this are journaled as one reload
+CATALOG_JOURNAL_MAX_ENTRIES = 1000
+# Readers further behind than this many entries reload in full
+CATALOG_JOURNAL_APPLY_MAX = 5000
+# Entries are kept for the last CATALOG_JOURNAL_VERSIONS versions
+CATALOG_JOURNAL_VERSIONS = 1000
+CATALOG_CHANGES_PER_PAGE = 50
+
+@event.listens_for(db.session, 'after_flush')
+def note_catalog_changes(session, flush_context):
+    changes = session.info.setdefault('catalog_changes', {})
+    for action, objects in (('add', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            kind = CATALOG_MODEL_KINDS.get(type(obj))
+            if kind is None:
+                continue
+            key = (kind, 0 if kind == 'shop' else obj.id)
+            entry = changes.get(key)
+            if entry is None:
+                entry = changes[key] = {"kind": kind, "row_id": key[1], "action": action, "fields": set()}
+            elif action == 'delete':
+                entry["action"] = action
+            entry["name"] = getattr(obj, 'name', None)
+            if action == 'update':
+                # Also noted when no value changed: the row is reloaded either way
+                state = db.inspect(obj)
+                entry["fields"].update(
+                    attr.key for attr in state.attrs
+                    if attr.key in state.mapper.column_attrs and attr.history.has_changes()
+                )
+
+def discard_catalog_changes(session, *args):
+    session.info.pop('catalog_changes', None)
+
+event.listen(db.session, 'after_commit', discard_catalog_changes)
+event.listen(db.session, 'after_soft_rollback', discard_catalog_changes)
+
+def journal_catalog():
+    # Bump the catalog version and journal the changes flushed so far, in the current transaction
+    db.session.flush()
+    changes = list(db.session.info.pop('catalog_changes', {}).values())
+    if not changes or len(changes) > CATALOG_JOURNAL_MAX_ENTRIES:
+        changes = [{"kind": "catalog", "row_id": 0, "action": "reload", "name": None, "fields": set()}]
+    for change in changes:
+        change["name"] = change["name"][:200] if change["name"] else None
+        change["fields"] = ','.join(sorted(change["fields"]))[:200] or None
+    db.session.execute(db.update(CatalogVersion).values(version=CatalogVersion.version + 1))
+    version = db.select(CatalogVersion.version).scalar_subquery()
+    db.session.execute(db.insert(CatalogChange).values(
+        version=version,
+        created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        source=request.endpoint if has_request_context() else None
+    ), changes)
+    db.session.execute(db.delete(CatalogChange).where(CatalogChange.version <= version - CATALOG_JOURNAL_VERSIONS))
+
+def commit_catalog():
+    # Commit an admin change together with a version bump and its journal
+    # entries, then bring this worker's snapshot up to date
+    journal_catalog()
+    db.session.commit()
+    update_catalog()
+
+def read_journal(since, version):
+    # The entries of the versions after since up to version, or None unless
+    # every one of those versions is journaled row by row
+    if since is None or since > version:
+        return None
+    entries = db.session.execute(
+        db.select(CatalogChange.version, CatalogChange.kind, CatalogChange.row_id, CatalogChange.action)
+        .where(CatalogChange.version > since, CatalogChange.version <= version)
+        .order_by(CatalogChange.version, CatalogChange.seq)
+        .limit(CATALOG_JOURNAL_APPLY_MAX + 1)
     ).all()
+    if len(entries) > CATALOG_JOURNAL_APPLY_MAX or any(entry.action == 'reload' for entry in entries):
+        return None
+    if {entry.version for entry in entries} != set(range(since + 1, version + 1)):
+        return None
+    return entries
+
+def journal_touched(services_data, since, version):
+    # Ids per kind journaled after version since, for /api/catalog?since=
+    # versions older than the digests in _catalog_history. Rows added count
+    # with everything now under them, which may include rows they adopted
+    # (see update_catalog()).
+    if since is None or since in _catalog_history:
+        return None
+    entries = read_journal(since, version)
+    if entries is None:
+        return None
+    touched = {kind: set() for kind in CATALOG_KINDS}
+    for entry in entries:
+        if entry.kind not in touched:
+            continue
+        touched[entry.kind].add(entry.row_id)
+        if entry.action == 'add':
+            for kind, ids in services_data.subtree(entry.kind, entry.row_id).items():
+                touched[kind].update(ids)
+    return touched
+
+def update_catalog():
+    # Bring this worker's snapshot up to the stored version
+    with _catalog_lock:
+        previous = _catalog["services_data"]
+        since = _catalog["version"]
+        version = current_catalog_version()
+        entries = None if previous is None else read_journal(since, version)
+        if entries is None:
+            return refresh_catalog()
+        if not entries:
+            _catalog["checked_at"] = time.monotonic()
+            _catalog["pending_since"] = None
+            return previous
+
+        changes = {kind: {} for kind in CATALOG_KINDS}
+        shop = False
+        for entry in entries:
+            if entry.kind == 'shop':
+                shop = True
+            else:
+                changes[entry.kind][entry.row_id] = None
+        # Rows no longer stored stay None, i.e. are removed
+        for kind, rows in changes.items():
+            if rows:
+                rows.update(list(load_catalog_rows(kind, list(rows))))
+        # A row new to the snapshot adopts the rows already stored under its
+        # id, which no entry names: rows left without a parent (e.g. by
+        # deletes bypassing the ORM cascade) are dropped until one appears
+        for parent_kind, kind in zip(CATALOG_KINDS, CATALOG_KINDS[1:]):
+            adopting = [
+                row_id for row_id, row in changes[parent_kind].items()
+                if row is not None and not previous.contains(parent_kind, row_id)
+            ]
+            if adopting:
+                for row_id, row in list(load_catalog_rows(kind, parent_ids=adopting)):
+                    changes[kind].setdefault(row_id, row)
+        services_data = previous.patch(changes, order_messages.compile_category, order_messages.compile_item)
+
+        # Row hashes of the rows touched and of those removed with a parent
+        hashes = {kind: {} for kind in CATALOG_KINDS}
+        for kind, rows in changes.items():
+            for row_id, row in rows.items():
+                if row is None:
+                    for child, ids in previous.subtree(kind, row_id).items():
+                        hashes[child].update(dict.fromkeys(ids))
+        for kind, rows in changes.items():
+            for row_id in rows:
+                entity = services_data.entity(kind, row_id)
+                hashes[kind][row_id] = None if entity is None else row_hash(entity)
+        digest = _catalog_history.get(since)
+        digest = digest.updated(hashes) if digest is not None else CatalogDigest(services_data.entities())
+
+        # Search documents cover a service with its subcategory and variants
+        service_ids = set(hashes["services"])
+        for catalog in (previous, services_data):
+            for kind in ('subcategories', 'services'):
+                for row_id in changes[kind]:
+                    service_ids.update(catalog.subtree(kind, row_id).get('services', ()))
+            for row_id in changes['variants']:
+                variant = catalog.variant(row_id)
+                if variant is not None:
+                    service_ids.add(variant.service_id)
+        search_index.update(services_data.service_entities(service_ids), service_ids)
+
+        if shop:
+            _catalog["shop_status"] = _freeze(load_shop_status())
+        if app.config['METRICS_ENABLED']:
+            metrics.inc('catalog_journal_applies_total')
+        install_catalog(version, services_data, digest)
+    return services_data
 
-    services_data = {"categories": []}
+@app.before_request
+def sync_catalog():
+    if request.endpoint == 'static' or _catalog["services_data"] is None:
+        return
+    now = time.monotonic()
+    admin = request.path.startswith('/admin')
+    pending = _catalog["pending_since"]
+    if pending is not None:
+        # A newer version is known; later edits made within the window are
+        # picked up by the same update
+        if admin or now - pending >= app.config['CATALOG_COALESCE_WINDOW']:
+            update_catalog()
+        return
+    interval = app.config['CATALOG_CHECK_INTERVAL']
+    if request.endpoint == 'cart_quote':
+        interval = max(interval, app.config['QUOTE_CHECK_INTERVAL'])
+    if now - _catalog["checked_at"] < interval:
+        return
+    _catalog["checked_at"] = now
+    if current_catalog_version() != _catalog["version"]:
+        if admin or app.config['CATALOG_COALESCE_WINDOW'] <= 0:
+            update_catalog()
+        else:
+            _catalog["pending_since"] = now
+
+# Bulk catalog import/export
+# The catalog is exchanged as one flat row per variant (CATALOG_COLUMNS), as
+# CSV or as a JSON array of row objects, with the parent columns repeated on
+# every row. A row with empty variant (or service, or subcategory) columns
+# carries a parent without children. Ids tie rows to existing entities, rows
+# without ids match by name under the same parent or create new entities,
+# and existing entities missing from the file are deleted. Files are parsed
+# row by row and the diff is applied with bulk statements in one transaction.
+CATALOG_COLUMNS = (
+    'category_id', 'category', 'category_image',
+    'subcategory_id', 'subcategory',
+    'service_id', 'service', 'service_available', 'description', 'service_image',
+    'variant_id', 'variant', 'price', 'unit', 'variant_available',
+)
+CATALOG_KINDS = ('categories', 'subcategories', 'services', 'variants')
+# Model and value columns compared/written per kind, parent id first
+IMPORT_FIELDS = {
+    'categories': (Category, ('name', 'image_filename')),
+    'subcategories': (Subcategory, ('category_id', 'name')),
+    'services': (Service, ('subcategory_id', 'name', 'available', 'description', 'image_filename')),
+    'variants': (Variant, ('service_id', 'name', 'price', 'unit', 'available')),
+}
+IMPORT_LABELS = {'categories': 'category', 'subcategories': 'subcategory', 'services': 'service', 'variants': 'variant'}
+IMPORT_MAX_ERRORS = 20
+IMPORT_CHUNK_SIZE = 500
+# Largest single JSON row accepted while looking for the end of an object
+IMPORT_MAX_ROW_BYTES = 64 * 1024
+JSON_SEPARATOR_RE = re.compile(r'[\s,]*')
+
+def catalog_rows(services_data):
+    for category in services_data["categories"]:
+        cat_row = {'category_id': category["id"], 'category': category["name"], 'category_image': category["image_filename"]}
+        if not category["subcategories"]:
+            yield cat_row
+        for subcategory in category["subcategories"]:
+            sub_row = dict(cat_row, subcategory_id=subcategory["id"], subcategory=subcategory["name"])
+            if not subcategory["services"]:
+                yield sub_row
+            for service in subcategory["services"]:
+                service_row = dict(
+                    sub_row,
+                    service_id=service["id"],
+                    service=service["name"],
+                    service_available=service["available"],
+                    description=service["description"],
+                    service_image=service["image_filename"]
+                )
+                if not service["variants"]:
+                    yield service_row
+                for variant in service["variants"]:
+                    yield dict(
+                        service_row,
+                        variant_id=variant["id"],
+                        variant=variant["name"],
+                        price=variant["price"],
+                        unit=variant["unit"],
+                        variant_available=variant["available"]
+                    )
+
+def export_catalog_csv(services_data):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CATALOG_COLUMNS)
+    writer.writeheader()
+    for count, row in enumerate(catalog_rows(services_data), 1):
+        writer.writerow({key: int(value) if isinstance(value, bool) else value for key, value in row.items()})
+        if count % IMPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def export_catalog_json(services_data):
+    chunk = ['[']
+    for count, row in enumerate(catalog_rows(services_data)):
+        chunk.append((',\n' if count else '\n') + json.dumps(
+            {column: row.get(column) for column in CATALOG_COLUMNS}, ensure_ascii=False
+        ))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append('\n]\n')
+    yield ''.join(chunk)
+
+def iter_json_rows(stream, chunk_size=64 * 1024):
+    # Decode the objects of a top-level JSON array one at a time, keeping at
+    # most one partially read object in memory
+    decoder = json.JSONDecoder()
+    buffer, pos, eof, started = '', 0, False, False
+    while True:
+        pos = JSON_SEPARATOR_RE.match(buffer, pos).end()
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array of rows")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                row, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof or len(buffer) - pos > IMPORT_MAX_ROW_BYTES:
+                    raise
+            else:
+                yield row
+                continue
+        if eof:
+            raise ValueError("Unexpected end of JSON input")
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+def read_catalog_rows(stream, fmt):
+    # (line or row number, row dict) pairs from a text stream
+    if fmt == 'json':
+        return enumerate(iter_json_rows(stream), 1)
+    reader = csv.DictReader(stream)
+    return ((reader.line_num, row) for row in reader)
+
+class ImportRowError(ValueError):
+    pass
+
+# Diff of an import file against the current tables. feed() resolves each
+# row to entity ids (assigning ids to new entities up front, so children can
+# reference them) and records the file's values per id; the inserts, updates
+# and deletes fall out of comparing those with the existing rows.
+class CatalogImport:
+    def __init__(self):
+        self.existing = {}
+        self.by_name = {}
+        self.next_id = {}
+        for kind, (model, fields) in IMPORT_FIELDS.items():
+            rows = db.session.execute(db.select(model.id, *(getattr(model, field) for field in fields)))
+            self.existing[kind] = {row[0]: self._normalize(kind, row[1:]) for row in rows}
+            # Rows without an id match an existing entity by (parent id, name)
+            self.by_name[kind] = {}
+            for row_id, values in self.existing[kind].items():
+                key = (values[0], values[1]) if kind != 'categories' else (None, values[0])
+                self.by_name[kind].setdefault(key, row_id)
+            self.next_id[kind] = max(self.existing[kind], default=0) + 1
+        self.seen = {kind: {} for kind in CATALOG_KINDS}
+        self.new_keys = {kind: {} for kind in CATALOG_KINDS}
+        self.rows = 0
+        self.errors = []
+        self.error_count = 0
+
+    @staticmethod
+    def _normalize(kind, values):
+        # Match the types and empty values produced by _parse_row()
+        values = list(values)
+        fields = IMPORT_FIELDS[kind][1]
+        for index, field in enumerate(fields):
+            if field == 'available':
+                values[index] = True if values[index] is None else bool(values[index])
+            elif field in ('description', 'image_filename'):
+                values[index] = values[index] or None
+        return tuple(values)
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append(f"Row {line}: {message}")
+
+    def feed_file(self, stream, fmt):
+        try:
+            for line, row in read_catalog_rows(stream, fmt):
+                self.feed(row, line)
+        except (ValueError, csv.Error) as e:
+            self.error(self.rows + 1, f"Could not parse the file: {e}")
+
+    def feed(self, row, line):
+        self.rows += 1
+        if not isinstance(row, dict):
+            self.error(line, "Expected an object with the catalog columns")
+            return
+        try:
+            self._feed(row)
+        except ImportRowError as e:
+            self.error(line, str(e))
+
+    def _feed(self, row):
+        text = lambda column: str(row.get(column) if row.get(column) is not None else '').strip()
+
+        category_id = self._resolve(
+            'categories', self._id(row, 'category_id'), None, text('category'),
+            (text('category'), text('category_image') or None)
+        )
+        has_variant = any(text(column) for column in ('variant_id', 'variant', 'price'))
+        has_service = has_variant or any(text(column) for column in ('service_id', 'service'))
+        has_subcategory = has_service or any(text(column) for column in ('subcategory_id', 'subcategory'))
+        if not has_subcategory:
+            return
+
+        subcategory_id = self._resolve(
+            'subcategories', self._id(row, 'subcategory_id'), category_id, text('subcategory'),
+            (category_id, text('subcategory'))
+        )
+        if not has_service:
+            return
 
-    for category in categories:
-        cat_dict = {
-            "id": category.id,
-            "name": category.name,
-            "image_filename": category.image_filename,
-            "subcategories": []
-        }
+        service_id = self._resolve(
+            'services', self._id(row, 'service_id'), subcategory_id, text('service'),
+            (subcategory_id, text('service'), self._bool(row, 'service_available'),
+             text('description') or None, text('service_image') or None)
+        )
+        if not has_variant:
+            return
+
+        try:
+            price = float(text('price'))
+        except ValueError:
+            price = None
+        if price is None or not price.is_integer():
+            raise ImportRowError(f"price must be a whole number, got '{text('price')}'")
+        self._resolve(
+            'variants', self._id(row, 'variant_id'), service_id, text('variant'),
+            (service_id, text('variant'), int(price), text('unit'), self._bool(row, 'variant_available'))
+        )
 
-        for subcategory in category.subcategories:
-            sub_dict = {
-                "id": subcategory.id,
-                "name": subcategory.name,
-                "services": []
+    @staticmethod
+    def _id(row, column):
+        value = row.get(column)
+        if value is None or str(value).strip() == '':
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ImportRowError(f"{column} must be a number, got '{value}'") from None
+
+    @staticmethod
+    def _bool(row, column):
+        value = row.get(column)
+        if value is None or isinstance(value, bool):
+            return True if value is None else value
+        value = str(value).strip().lower()
+        if value in ('', '1', 'true', 'yes', 'y'):
+            return True
+        if value in ('0', 'false', 'no', 'n'):
+            return False
+        raise ImportRowError(f"{column} must be 1/0 or true/false, got '{value}'")
+
+    def _resolve(self, kind, row_id, parent_id, name, values):
+        label = IMPORT_LABELS[kind]
+        if not name:
+            raise ImportRowError(f"{label} name is required")
+        if row_id is not None:
+            if row_id not in self.existing[kind]:
+                raise ImportRowError(f"unknown {label} id {row_id}")
+        else:
+            key = (parent_id, name)
+            row_id = self.new_keys[kind].get(key) or self.by_name[kind].get(key)
+            if row_id is None:
+                row_id = self.next_id[kind]
+                self.next_id[kind] += 1
+                self.new_keys[kind][key] = row_id
+
+        previous = self.seen[kind].setdefault(row_id, values)
+        if previous != values:
+            raise ImportRowError(f"{label} {row_id} ('{name}') has different values on another row")
+        return row_id
+
+    def changes(self):
+        changes = {}
+        for kind in CATALOG_KINDS:
+            existing, seen = self.existing[kind], self.seen[kind]
+            changes[kind] = {
+                "insert": [row_id for row_id in seen if row_id not in existing],
+                "update": [row_id for row_id, values in seen.items() if row_id in existing and existing[row_id] != values],
+                "delete": [row_id for row_id in existing if row_id not in seen],
             }
+        return changes
+
+    def report(self):
+        changes = self.changes()
+        return {
+            "rows": self.rows,
+            "errors": self.errors,
+            "error_count": self.error_count,
+            "changes": {
+                kind: {action: len(ids) for action, ids in actions.items()}
+                for kind, actions in changes.items()
+            }
+        }
 
-            for service in subcategory.services:
-                service_dict = {
-                    "id": service.id,
-                    "name": service.name,
-                    "available": service.available,  # Make sure this is included
-                    "description": service.description,
-                    "image_filename": service.image_filename,
-                    "variants": []
-                }
-
-                for variant in service.variants:
-                    service_dict["variants"].append({
-                        "id": variant.id,
-                        "name": variant.name,
-                        "price": variant.price,
-                        "unit": variant.unit,
-                        "available": variant.available  # Make sure this is included
-                    })
+    def apply(self):
+        changes = self.changes()
+        for kind in CATALOG_KINDS:
+            model, fields = IMPORT_FIELDS[kind]
+            for action in ("insert", "update"):
+                rows = [
+                    dict(zip(fields, self.seen[kind][row_id]), id=row_id)
+                    for row_id in changes[kind][action]
+                ]
+                for start in range(0, len(rows), IMPORT_CHUNK_SIZE):
+                    statement = db.insert(model) if action == "insert" else db.update(model)
+                    db.session.execute(statement, rows[start:start + IMPORT_CHUNK_SIZE])
+        # Children first, so no row is ever left pointing at a deleted parent
+        for kind in reversed(CATALOG_KINDS):
+            model = IMPORT_FIELDS[kind][0]
+            ids = changes[kind]["delete"]
+            for start in range(0, len(ids), IMPORT_CHUNK_SIZE):
+                db.session.execute(
+                    db.delete(model).where(model.id.in_(ids[start:start + IMPORT_CHUNK_SIZE])),
+                    execution_options={'synchronize_session': False}
+                )
+        commit_catalog()
+
+def import_catalog_file(stream, fmt, dry_run=False):
+    catalog_import = CatalogImport()
+    catalog_import.feed_file(stream, fmt)
+    report = catalog_import.report()
+    report["applied"] = False
+    has_changes = any(any(counts.values()) for counts in report["changes"].values())
+    if not dry_run and not catalog_import.error_count and has_changes:
+        try:
+            catalog_import.apply()
+        except Exception:
+            db.session.rollback()
+            raise
+        report["applied"] = True
+    return report
+
+# Bulk updates
+# /admin/bulk_update takes {"changes": [...]}. Every change becomes a single
+# set-based UPDATE of the variants or services picked by its filters, and all
+# of them are committed together with one catalog version bump. Rows already
+# holding the new values are excluded, so the counts are rows really changed.
+#   {"target": "variants", "category_ids": [2], "available": false}
+#   {"target": "variants", "subcategory_ids": [4, 5], "price": {"percent": 10}}
+#   {"target": "services", "ids": [7, 8], "available": true}
+# price takes one of {"set": n}, {"add": n} or {"percent": n}; prices are
+# rounded to whole rupees and never go below zero.
+BULK_TARGETS = {'variants': Variant, 'services': Service}
+BULK_PRICE_MODES = ('set', 'add', 'percent')
+
+class BulkUpdateError(ValueError):
+    pass
+
+def _bulk_ids(change, key):
+    ids = change.get(key)
+    if ids is None:
+        return None
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise BulkUpdateError(f"'{key}' must be a list of ids")
+    return ids
+
+def _bulk_number(value, name):
+    # request.get_json() accepts NaN and Infinity, which round() rejects
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise BulkUpdateError(f"'{name}' must be a finite number")
+    return value
+
+def bulk_update_statement(change):
+    if not isinstance(change, dict):
+        raise BulkUpdateError("each change must be an object")
+    target = change.get('target')
+    model = BULK_TARGETS.get(target)
+    if model is None:
+        raise BulkUpdateError("'target' must be 'variants' or 'services'")
+    service_column = Variant.service_id if model is Variant else Service.id
+
+    conditions = []
+    ids = _bulk_ids(change, 'ids')
+    if ids is not None:
+        conditions.append(model.id.in_(ids))
+    service_ids = _bulk_ids(change, 'service_ids') if model is Variant else None
+    if service_ids is not None:
+        conditions.append(Variant.service_id.in_(service_ids))
+    subcategory_ids = _bulk_ids(change, 'subcategory_ids')
+    if subcategory_ids is not None:
+        conditions.append(service_column.in_(
+            db.select(Service.id).where(Service.subcategory_id.in_(subcategory_ids))
+        ))
+    category_ids = _bulk_ids(change, 'category_ids')
+    if category_ids is not None:
+        conditions.append(service_column.in_(
+            db.select(Service.id).where(Service.subcategory_id.in_(
+                db.select(Subcategory.id).where(Subcategory.category_id.in_(category_ids))
+            ))
+        ))
+    if not conditions and change.get('all') is not True:
+        raise BulkUpdateError("add a filter (ids, service_ids, subcategory_ids, category_ids) or \"all\": true")
+
+    if model is Service and ('price' in change or 'unit' in change):
+        raise BulkUpdateError("services only have 'available'; change prices and units on their variants")
+    values = {}
+    if 'available' in change:
+        if not isinstance(change['available'], bool):
+            raise BulkUpdateError("'available' must be true or false")
+        values[model.available] = change['available']
+    if model is Variant and 'unit' in change:
+        if not isinstance(change['unit'], str):
+            raise BulkUpdateError("'unit' must be a string")
+        values[Variant.unit] = change['unit'].strip()
+    if model is Variant and 'price' in change:
+        price = change['price']
+        if not isinstance(price, dict) or len(price) != 1 or next(iter(price)) not in BULK_PRICE_MODES:
+            raise BulkUpdateError("'price' must be one of {\"set\": n}, {\"add\": n} or {\"percent\": n}")
+        mode, amount = next(iter(price.items()))
+        amount = _bulk_number(amount, f"price.{mode}")
+        if mode == 'set':
+            expression = db.literal(max(0, round(amount)))
+        else:
+            if mode == 'add':
+                expression = Variant.price + round(amount)
+            else:
+                expression = db.cast(db.func.round(Variant.price * (100 + amount) / 100.0), db.Integer)
+            expression = db.case((expression < 0, 0), else_=expression)
+        values[Variant.price] = expression
+    if not values:
+        raise BulkUpdateError("nothing to change; set available, unit or price")
+
+    return (
+        db.update(model)
+        .where(*conditions, db.or_(*(column.is_distinct_from(value) for column, value in values.items())))
+        .values(values)
+    )
 
-                sub_dict["services"].append(service_dict)
+# Order log
+# submit_order() only puts the order on an in-process queue; a background
+# thread writes everything queued every ORDER_FLUSH_INTERVAL seconds in one
+# transaction, and the queue is drained once more at interpreter exit.
+_order_queue = queue.Queue()
+_order_writer = {"thread": None, "pid": None}
+_order_writer_lock = threading.Lock()
+_order_writer_stop = threading.Event()
+
+def _order_from_dict(data):
+    return Order(
+        created_at=data["created_at"],
+        name=data["name"],
+        phone=data["phone"],
+        address=data["address"],
+        payment_mode=data["payment_mode"],
+        total=data["total"],
+        items=[
+            OrderItem(
+                category_id=item["category_id"],
+                subcategory_id=item["subcategory_id"],
+                service_id=item["service_id"],
+                variant_id=item["variant_id"],
+                category=item["category"],
+                subcategory=item["subcategory"],
+                service_name=item["name"],
+                variant_name=item["variant"],
+                unit=item["unit"],
+                price=item["price"],
+                quantity=item["quantity"],
+                subtotal=item["subtotal"]
+            )
+            for item in data["items"]
+        ]
+    )
 
-            cat_dict["subcategories"].append(sub_dict)
+def save_orders(batch):
+    db.session.add_all([_order_from_dict(data) for data in batch])
+    rollups = RollupBatch(SHOP_TIMEZONE)
+    for data in batch:
+        rollups.add(data["created_at"], data["items"])
+    apply_rollups(rollups)
+    db.session.commit()
 
-        services_data["categories"].append(cat_dict)
+def flush_orders():
+    batch = []
+    while True:
+        try:
+            batch.append(_order_queue.get_nowait())
+        except queue.Empty:
+            break
+    if not batch:
+        return 0
+
+    with app.app_context():
+        try:
+            save_orders(batch)
+        except Exception:
+            db.session.rollback()
+            app.logger.exception("Batched order write failed, retrying orders one by one")
+            for data in batch:
+                try:
+                    save_orders([data])
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Dropping order that could not be saved: %r", data)
+    return len(batch)
+
+def _run_order_writer():
+    while not _order_writer_stop.wait(app.config['ORDER_FLUSH_INTERVAL']):
+        flush_orders()
+
+def record_order(data):
+    _order_queue.put(data)
+    # Threads do not survive a fork, so every worker process starts its own writer
+    if _order_writer["pid"] != os.getpid():
+        with _order_writer_lock:
+            if _order_writer["pid"] != os.getpid():
+                thread = threading.Thread(target=_run_order_writer, name="order-writer", daemon=True)
+                thread.start()
+                _order_writer.update(thread=thread, pid=os.getpid())
+
+# Sales rollups
+# Rows of a RollupBatch are upserted onto the stored totals, so concurrent
+# writers and the backfill only ever add to them.
+ROLLUP_BACKFILL_ORDERS = 5000
+ANALYTICS_MAX_DAYS = 366
+ANALYTICS_TOP = 10
+
+def apply_rollups(rollups):
+    rows = list(rollups.rows())
+    if not rows:
+        return
+    # A Core statement on the table: the ORM bulk insert path costs several
+    # times the executemany itself
+    table = SalesRollup.__table__
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.period, table.c.level, table.c.bucket, table.c.key],
+        set_={
+            "name": statement.excluded.name,
+            "orders": table.c.orders + statement.excluded.orders,
+            "quantity": table.c.quantity + statement.excluded.quantity,
+            "revenue": table.c.revenue + statement.excluded.revenue,
+        }
+    )
+    db.session.execute(statement, rows)
+
+def backfill_rollups():
+    # Rebuild the rollups from the order log while the shop keeps taking
+    # orders: the old rollups are cleared in the same transaction that reads
+    # the last order id, orders up to it are added up here, and later ones
+    # by the order writer.
+    db.session.execute(db.delete(SalesRollup))
+    last_id = db.session.execute(db.select(db.func.max(Order.id))).scalar() or 0
+    db.session.commit()
 
-    return services_data
+    columns = (
+        Order.id, Order.created_at, OrderItem.category_id, OrderItem.service_id, OrderItem.variant_id,
+        OrderItem.category, OrderItem.service_name.label('name'), OrderItem.variant_name.label('variant'),
+        OrderItem.quantity, OrderItem.subtotal
+    )
+    orders = 0
+    for start in range(0, last_id, ROLLUP_BACKFILL_ORDERS):
+        rows = db.session.execute(
+            db.select(*columns)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(Order.id > start, Order.id <= min(start + ROLLUP_BACKFILL_ORDERS, last_id))
+            .order_by(Order.id)
+        ).mappings()
+        rollups = RollupBatch(SHOP_TIMEZONE)
+        for _, items in itertools.groupby(rows, key=lambda row: row["id"]):
+            items = list(items)
+            rollups.add(items[0]["created_at"], items)
+            orders += 1
+        apply_rollups(rollups)
+        db.session.commit()
+    return orders
+
+def sales_rollups(period, level, first, last):
+    # Rollup rows with first <= bucket < last: a range of the primary key
+    return db.session.execute(
+        db.select(SalesRollup)
+        .where(SalesRollup.period == period, SalesRollup.level == level,
+               SalesRollup.bucket >= first, SalesRollup.bucket < last)
+        .order_by(SalesRollup.bucket, SalesRollup.key)
+    ).scalars().all()
+
+def top_sellers(level, day, limit=ANALYTICS_TOP):
+    return db.session.execute(
+        db.select(SalesRollup)
+        .where(SalesRollup.period == 'day', SalesRollup.level == level, SalesRollup.bucket == day)
+        .order_by(SalesRollup.revenue.desc(), SalesRollup.key)
+        .limit(limit)
+    ).scalars().all()
+
+@atexit.register
+def stop_order_writer():
+    _order_writer_stop.set()
+    thread = _order_writer["thread"]
+    if thread is not None and _order_writer["pid"] == os.getpid():
+        thread.join(timeout=10)
+    flush_orders()
 
 # Admin credentials
 ADMIN_USERNAME = "admin"
@@ -182,12 +1762,152 @@ def login_required(f):
 
 @app.route('/')
 def index():
-    shop_status = ShopStatus.query.first()
-    if not shop_status or shop_status.is_open:
-        services_data = get_services_data()
-        return render_template('index.html', services_data=services_data, show_whatsapp=False)
+    if shop_is_open():
+        # The menu itself is fetched from /api/catalog, so the page only changes with the template
+        return cached_page(("open",), lambda: stream_template('index.html', show_whatsapp=False))
     else:
-        return render_template('closed.html', message=shop_status.message)
+        message = get_shop_status()["message"]
+        return cached_page(("closed", message), lambda: render_template('closed.html', message=message))
+
+@app.route('/api/catalog')
+def api_catalog():
+    services_data = get_services_data()
+    version = _catalog["version"]
+    since = request.args.get('since', type=int)
+    touched = journal_touched(services_data, since, version)
+    if since not in _catalog_history and touched is None:
+        # Any version a delta cannot be sent for gets the one full catalog
+        since = None
+    return cached_page(
+        ("catalog", version, since),
+        lambda: catalog_delta(services_data, version, since, touched),
+        mimetype='application/json'
+    )
+
+@app.route('/api/search')
+def api_search():
+    get_services_data()
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 10, type=int), SEARCH_MAX_RESULTS))
+    return jsonify(query=query, version=_catalog["version"], results=search_index.search(query, limit))
+
+# Offline storefront
+# /sw.js is a service worker generated from the content-hashed URLs of the
+# page shell, so a changed asset changes the script and browsers reinstall
+# it. Catalog images are cached as they are viewed; /cache-manifest.json
+# lists the image URLs of a catalog version, and the worker drops the cached
+# ones that are no longer listed when the page reports a new version.
+SHELL_ASSETS = ('styles.css', 'logo3.png', 'call-logo.png', 'whatsapp.png', 'qr.jpg')
+
+def catalog_image_urls(services_data):
+    for folder, kind in (('categories', 'categories'), ('services', 'services')):
+        for _, row in services_data.iter_entities(kind):
+            filename = row["image_filename"]
+            if not filename:
+                continue
+            query = f"?v={row['image_version']}" if row["image_version"] else ""
+            yield f"/static/{folder}/{filename}{query}"
+            for width in row["image_widths"]:
+                for ext in ('jpg', 'webp'):
+                    yield f"/static/{folder}/{resized_filename(filename, width, ext)}{query}"
+
+@app.route('/sw.js')
+def service_worker():
+    shell = [url_for('index')] + [static_url(filename) for filename in SHELL_ASSETS]
+    return cached_page(
+        ("sw.js", tuple(shell)),
+        lambda: render_template('sw.js', shell=shell, manifest_url=url_for('cache_manifest')),
+        mimetype='text/javascript'
+    )
+
+@app.route('/cache-manifest.json')
+def cache_manifest():
+    services_data = get_services_data()
+    version = _catalog["version"]
+    return cached_page(
+        ("cache-manifest", version),
+        lambda: json.dumps({"version": version, "images": list(catalog_image_urls(services_data))}, separators=(',', ':')),
+        mimetype='application/json'
+    )
+
+# Cart pricing
+# Carts are priced from the catalog snapshot without touching the database:
+# by /api/cart/quote while the customer shops and by submit_order() for the
+# order itself, so the storefront shows the totals the order will have.
+CART_MAX_LINES = 200
+CART_MAX_QUANTITY = 999
+
+def price_cart(services_data, cart):
+    # cart: {(service_id, variant_id): quantity}. Returns (line item, variant)
+    # pairs in cart order and an error for every key that cannot be ordered:
+    # unknown, or the variant or its service marked unavailable.
+    lines, errors = [], []
+    parents = {}  # service id -> (service, subcategory, category), shared by its variants
+    for (service_id, variant_id), quantity in cart.items():
+        variant = services_data.order_line(service_id, variant_id)
+        if variant is None or not variant.available or not variant.service.available:
+            errors.append({
+                "service_id": service_id,
+                "variant_id": variant_id,
+                "error": "unknown" if variant is None else "unavailable"
+            })
+            continue
+        if service_id not in parents:
+            service = variant.service
+            subcategory = service.subcategory
+            parents[service_id] = (service, subcategory, subcategory.category)
+        service, subcategory, category = parents[service_id]
+        price = variant.price
+        lines.append(({
+            'category_id': category.id,
+            'subcategory_id': subcategory.id,
+            'service_id': service_id,
+            'variant_id': variant_id,
+            'name': service.name,
+            'variant': variant.name,
+            'quantity': quantity,
+            'price': price,
+            'unit': variant.unit,
+            'subtotal': quantity * price,
+            'category': category.name,
+            'subcategory': subcategory.name
+        }, variant))
+    return lines, errors
+
+@app.route('/api/cart/quote', methods=['POST'])
+def cart_quote():
+    # {"items": [{"service_id", "variant_id", "quantity"}, ...]}; repeated
+    # keys are merged and every key is priced once
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(items, list) or len(items) > CART_MAX_LINES:
+        return jsonify(error=f"Expected an items list of at most {CART_MAX_LINES} lines"), 400
+
+    cart, errors = {}, []
+    for index, item in enumerate(items):
+        try:
+            key = (int(item['service_id']), int(item['variant_id']))
+            quantity = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            errors.append({"index": index, "error": "invalid"})
+            continue
+        quantity += cart.get(key, 0)
+        if not 0 < quantity <= CART_MAX_QUANTITY:
+            errors.append({"index": index, "service_id": key[0], "variant_id": key[1], "error": "quantity"})
+            continue
+        cart[key] = quantity
+
+    lines, unavailable = price_cart(get_services_data(), cart)
+    subtotal = sum(line['subtotal'] for line, _ in lines)
+    return jsonify(
+        version=_catalog["version"],
+        items=[{
+            key: line[key] for key in ('service_id', 'variant_id', 'name', 'variant', 'unit', 'price', 'quantity', 'subtotal')
+        } for line, _ in lines],
+        errors=errors + unavailable,
+        subtotal=subtotal,
+        total=subtotal
+    )
 
 @app.route('/submit_order', methods=['POST'])
 def submit_order():
@@ -198,10 +1918,6 @@ def submit_order():
     if not name or not phone or not address:
         return redirect(url_for('index'))
 
-    services_data = get_services_data()
-    selected_services = []
-    subtotal = 0
-
     # Collect all form data
     form_data = request.form.to_dict(flat=False)
 
@@ -220,25 +1936,11 @@ def submit_order():
             except (ValueError, IndexError):
                 continue
 
-    # Now find all selected services in our database structure
-    for category in services_data["categories"]:
-        for subcategory in category["subcategories"]:
-            for service in subcategory["services"]:
-                for variant in service["variants"]:
-                    key = (service["id"], variant["id"])
-                    if key in selected_items:
-                        quantity = selected_items[key]
-                        selected_services.append({
-                            'name': service['name'],
-                            'variant': variant['name'],
-                            'quantity': quantity,
-                            'price': variant['price'],
-                            'unit': variant['unit'],
-                            'subtotal': quantity * variant['price'],
-                            'category': category['name'],
-                            'subcategory': subcategory['name']
-                        })
-                        subtotal += quantity * variant['price']
+    # Price the cart from the catalog snapshot, skipping unknown or unavailable variants
+    lines, _ = price_cart(get_services_data(), selected_items)
+    selected_services = [line for line, _ in lines]
+    message_items = [(variant, line['quantity'], line['subtotal']) for line, variant in lines]
+    subtotal = sum(line['subtotal'] for line in selected_services)
 
     if not selected_services:
         return redirect(url_for('index'))
@@ -247,49 +1949,29 @@ def submit_order():
     grand_total = subtotal
 
     indian_timezone = pytz.timezone("Asia/Kolkata")
-    current_time = datetime.now(indian_timezone).strftime("%d-%m-%Y %I:%M %p")
-
-    message_parts = [
-        "📌 * Ranchi Mess.Com* 📌",
-        f"📅 *Date*: {current_time}",
-        "",
-        "👤 *Customer Details*:",
-        f"• *Name*: {name}",
-        f"• *Phone*: {phone}",
-        f"• *Address*: {address}",
-        "",
-        "🛒 *Ordered Items*:"
-    ]
-
-    # Group items by category for better organization
-    categories = {}
-    for service in selected_services:
-        if service['category'] not in categories:
-            categories[service['category']] = []
-        categories[service['category']].append(service)
-
-    # Add items to message grouped by category
-    for category_name, items in categories.items():
-        message_parts.append(f"\n*{category_name}*")
-        for item in items:
-            message_parts.append(
-                f"➡️ {item['name']} ({item['variant']}) - "
-                f"Qty: {item['quantity']} {item['unit']} × ₹{item['price']} = ₹{item['subtotal']}"
-            )
-            message_parts.append("")
-        message_parts.append("")
-    message_parts.extend([
-        "",
-        "💵 *Payment Summary*:",
-        f"• *Subtotal*: ₹{subtotal}",
-        f"• *Total Amount*: ₹{grand_total}",
-        f"• *Payment Mode*: {request.form.get('payment_mode', 'Online')}",
-        "",
-        "🛑 *Please Share Your current location link for fast delivery* 🛑",
-    ])
-
-    full_message = "\n".join(message_parts)
-    whatsapp_url = f"https://wa.me/+918709625288?text={requests.utils.quote(full_message)}"
+    ordered_at = datetime.now(indian_timezone)
+    current_time = ordered_at.strftime("%d-%m-%Y %I:%M %p")
+    payment_mode = request.form.get('payment_mode', 'Online')
+
+    record_order({
+        "created_at": ordered_at.astimezone(timezone.utc).replace(tzinfo=None),
+        "name": name,
+        "phone": phone,
+        "address": address,
+        "payment_mode": payment_mode,
+        "total": grand_total,
+        "items": selected_services
+    })
+
+    whatsapp_url = order_messages.render_url({
+        "date": current_time,
+        "name": name,
+        "phone": phone,
+        "address": address,
+        "subtotal": subtotal,
+        "total": grand_total,
+        "payment_mode": payment_mode,
+    }, message_items)
 
     return redirect(whatsapp_url)
 # Admin routes
@@ -312,22 +1994,202 @@ def admin_logout():
     session.pop('logged_in', None)
     return redirect(url_for('admin_login'))
 
+# Admin panel sections
+# The panel renders the category list and subcategory headers only. A
+# subcategory's services and variants are fetched on demand from
+# admin_subcategory(), a page at a time and optionally filtered by name.
+# After an edit the panel is reopened with ?open=<subcategory id> (or
+# ?service=<service id>) and renders just that section inline.
+ADMIN_PAGE_SIZE = 20
+
+def admin_redirect(anchor=None, subcategory_id=None, service_id=None):
+    return redirect(url_for('admin_panel', open=subcategory_id, service=service_id, _anchor=anchor))
+
+def admin_section(subcategory_id, page=1, query='', service_id=None):
+    subcategory = get_services_data().subcategory(subcategory_id)
+    if subcategory is None:
+        return None
+
+    query = query.strip()
+    services = subcategory["services"]
+    if query:
+        needle = query.lower()
+        services = [
+            service for service in services
+            if needle in service["name"].lower()
+            or any(needle in variant["name"].lower() for variant in service["variants"])
+        ]
+    pages = max(1, -(-len(services) // ADMIN_PAGE_SIZE))
+    if service_id is not None:
+        # Jump to the page holding the service that was just edited
+        for position, service in enumerate(services):
+            if service["id"] == service_id:
+                page = position // ADMIN_PAGE_SIZE + 1
+                break
+    page = min(max(page, 1), pages)
+    start = (page - 1) * ADMIN_PAGE_SIZE
+    return {
+        "category": subcategory["category"],
+        "subcategory": subcategory,
+        "services": services[start:start + ADMIN_PAGE_SIZE],
+        "total": len(services),
+        "page": page,
+        "pages": pages,
+        "query": query,
+    }
+
 @app.route('/admin/panel')
 @login_required
 def admin_panel():
     services_data = get_services_data()
-    shop_status = ShopStatus.query.first()
-    if not shop_status:
-        shop_status = ShopStatus(is_open=True)
-        db.session.add(shop_status)
-        db.session.commit()
+    shop_status = get_shop_status()
+
+    section = None
+    service_id = request.args.get('service', type=int)
+    subcategory_id = request.args.get('open', type=int)
+    if service_id is not None:
+        service = services_data.service(service_id)
+        if service is not None:
+            subcategory_id = service["subcategory_id"]
+    if subcategory_id is not None:
+        section = admin_section(
+            subcategory_id,
+            page=request.args.get('page', 1, type=int),
+            query=request.args.get('q', ''),
+            service_id=service_id,
+        )
 
     return render_template(
         'admin.html',
         services_data=services_data,
+        section=section,
         shop_status=shop_status,
+        open_now=shop_is_open(),
+        business_hours=[(day, format_hours(shop_status["hours"].get(weekday, ()))) for weekday, day in enumerate(WEEKDAYS)],
+        image_jobs=image_jobs(),
         login_page=False
     )
+
+@app.route('/admin/panel/subcategory/<int:subcategory_id>')
+@login_required
+def admin_subcategory(subcategory_id):
+    section = admin_section(
+        subcategory_id,
+        page=request.args.get('page', 1, type=int),
+        query=request.args.get('q', ''),
+    )
+    if section is None:
+        return "Subcategory not found", 404
+    return render_template('admin_subcategory.html', section=section)
+
+@app.route('/admin/orders')
+@login_required
+def admin_orders():
+    page = request.args.get('page', 1, type=int)
+    orders = db.paginate(
+        db.select(Order).options(db.selectinload(Order.items)).order_by(Order.id.desc()),
+        page=page,
+        per_page=app.config['ORDERS_PER_PAGE'],
+        error_out=False
+    )
+    return render_template(
+        'orders.html',
+        orders=orders,
+        timezone=pytz.timezone("Asia/Kolkata"),
+        utc=pytz.utc
+    )
+
+@app.route('/admin/analytics')
+@login_required
+def admin_analytics():
+    today = datetime.now(SHOP_TIMEZONE).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+    try:
+        day = datetime.strptime(request.args.get('date', ''), '%Y-%m-%d')
+    except ValueError:
+        day = today
+    days = max(1, min(request.args.get('days', 30, type=int), ANALYTICS_MAX_DAYS))
+    first_day = day - timedelta(days=days - 1)
+
+    # Every query reads a bounded range of rollup rows, however many orders there are
+    daily = {row.bucket: row for row in sales_rollups('day', 'total', first_day, day + timedelta(days=1))}
+    hourly = {row.bucket: row for row in sales_rollups('hour', 'total', day, day + timedelta(days=1))}
+    return render_template(
+        'analytics.html',
+        day=day,
+        days=days,
+        today=today,
+        daily=[(first_day + timedelta(days=offset), daily.get(first_day + timedelta(days=offset))) for offset in range(days)],
+        hourly=[(day + timedelta(hours=hour), hourly.get(day + timedelta(hours=hour))) for hour in range(24)],
+        totals={field: sum(getattr(row, field) for row in daily.values()) for field in ('orders', 'quantity', 'revenue')},
+        top={level: top_sellers(level, day) for level in ('category', 'service', 'variant')},
+        previous_day=day - timedelta(days=1),
+        next_day=day + timedelta(days=1) if day < today else None
+    )
+
+@app.route('/admin/catalog_changes')
+@login_required
+def admin_catalog_changes():
+    # The change journal, newest first, optionally for one kind of row
+    kind = request.args.get('kind', '')
+    statement = db.select(CatalogChange).order_by(CatalogChange.seq.desc())
+    if kind:
+        statement = statement.where(CatalogChange.kind == kind)
+    changes = db.paginate(
+        statement,
+        page=request.args.get('page', 1, type=int),
+        per_page=CATALOG_CHANGES_PER_PAGE,
+        error_out=False
+    )
+    return render_template(
+        'catalog_changes.html',
+        changes=changes,
+        kind=kind,
+        kinds=CATALOG_KINDS + ('shop', 'catalog'),
+        version=_catalog["version"],
+        timezone=SHOP_TIMEZONE,
+        utc=pytz.utc
+    )
+
+# Metrics endpoints: an admin session or HTTP basic auth with the admin
+# credentials (for Prometheus scrapers) is required
+def metrics_access(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not app.config['METRICS_ENABLED']:
+            return "Metrics are disabled", 404
+        auth = request.authorization
+        if not session.get('logged_in') and not (
+            auth and auth.username == ADMIN_USERNAME and auth.password == ADMIN_PASSWORD
+        ):
+            return "Unauthorized", 401, {'WWW-Authenticate': 'Basic realm="metrics"'}
+        return f(*args, **kwargs)
+    return decorated_function
+
+@app.route('/metrics')
+@metrics_access
+def metrics_endpoint():
+    lookups = metrics.values('cache_requests_total')
+    for cache in {labels[0] for labels in lookups}:
+        hits = lookups.get((cache, ('result', 'hit')), 0)
+        misses = lookups.get((cache, ('result', 'miss')), 0)
+        metrics.set('cache_hit_ratio', (cache,), hits / (hits + misses))
+    metrics.set('catalog_version', (), _catalog["version"] or 0)
+    metrics.set('order_queue_length', (), _order_queue.qsize())
+    response = make_response(metrics.render())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+@app.route('/metrics/profile')
+@metrics_access
+def metrics_profile():
+    # Folded stacks of the slowest sampled requests, e.g. flamegraph.pl profile.txt > profile.svg
+    if not app.config['METRICS_PROFILE']:
+        return "Profiling is disabled, set METRICS_PROFILE=1", 404
+    response = make_response(profiler.dump())
+    response.mimetype = 'text/plain'
+    if request.args.get('reset'):
+        profiler.reset()
+    return response
 # Category operations
 
 @app.route('/admin/add_category', methods=['POST'])
@@ -335,20 +2197,26 @@ def admin_panel():
 def add_category():
     name = request.form.get('name', '').strip()
     if name:
+        file = request.files.get('image')
+        if file is not None and (file.filename == '' or not allowed_file(file.filename)):
+            file = None
+        # Refuse before the category is published rather than after
+        if file is not None and image_queue_full():
+            return "Image processing is busy, please try again shortly", 503
+
         new_category = Category(name=name)
         db.session.add(new_category)
-        db.session.commit()
 
-        # Handle image upload
-        if 'image' in request.files:
-            file = request.files['image']
-            if file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(f"category_{new_category.id}.jpg")
-                filepath = os.path.join(app.config['CATEGORY_UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                new_category.image_filename = filename
-                db.session.commit()
+        commit_catalog()
 
+        # Handle image upload
+        if file is not None:
+            filename = secure_filename(f"category_{new_category.id}.jpg")
+            try:
+                queue_image(file, 'category', new_category.id, app.config['CATEGORY_UPLOAD_FOLDER'], filename)
+            except ImageQueueFull:
+                # The queue filled up meanwhile; the category is saved without its image
+                return redirect(url_for('admin_panel', image_busy=new_category.id, _anchor=f'category-{new_category.id}'))
 
         return redirect(url_for('admin_panel'))
     return redirect(url_for('admin_panel'))
@@ -360,25 +2228,23 @@ def update_category(category_id):
     name = request.form.get('name', '').strip()
     category = Category.query.get_or_404(category_id)
     if name:
+        file = request.files.get('image')
+        if file is not None and (file.filename == '' or not allowed_file(file.filename)):
+            file = None
+        # Refuse before anything is changed
+        if file is not None and image_queue_full('category', category.id):
+            return "Image processing is busy, please try again shortly", 503
         category.name = name
 
-        # Handle image upload
-        if 'image' in request.files:
-            file = request.files['image']
-            if file.filename != '' and allowed_file(file.filename):
-                # Delete old image if exists
-                if category.image_filename:
-                    old_filepath = os.path.join(app.config['CATEGORY_UPLOAD_FOLDER'], category.image_filename)
-                    if os.path.exists(old_filepath):
-                        os.remove(old_filepath)
-
-                # Save new image
-                filename = secure_filename(f"category_{category.id}.jpg")
-                filepath = os.path.join(app.config['CATEGORY_UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                category.image_filename = filename
+        # Queue the new image; the old one stays until it is swapped in
+        if file is not None:
+            filename = secure_filename(f"category_{category.id}.jpg")
+            try:
+                queue_image(file, 'category', category.id, app.config['CATEGORY_UPLOAD_FOLDER'], filename)
+            except ImageQueueFull:
+                return "Image processing is busy, please try again shortly", 503
 
-        db.session.commit()
+        commit_catalog()
         return redirect(url_for('admin_panel', _anchor=f'category-{category_id}'))
 
 
@@ -390,8 +2256,8 @@ def update_subcategory(category_id, subcategory_id):
     subcategory = Subcategory.query.get_or_404(subcategory_id)
     if name:
         subcategory.name = name
-        db.session.commit()
-        return redirect(url_for('admin_panel', _anchor=f'subcat-{subcategory_id}'))
+        commit_catalog()
+        return admin_redirect(f'subcat-{subcategory_id}', subcategory_id=subcategory_id)
 
 
 
@@ -407,8 +2273,8 @@ def update_service(category_id, subcategory_id, service_id):
         service.name = name
         service.available = available
         service.description = description
-        db.session.commit()
-        return redirect(url_for('admin_panel', _anchor=f'service-{service_id}'))
+        commit_catalog()
+        return admin_redirect(f'service-{service_id}', service_id=service_id)
 
 
 
@@ -424,25 +2290,20 @@ def upload_service_image(service_id):
     if file and allowed_file(file.filename):
         # Get the service
         service = Service.query.get_or_404(service_id)
-
-        # Delete old image if exists
-        if service.image_filename:
-            old_filepath = os.path.join(app.config['UPLOAD_FOLDER'], service.image_filename)
-            if os.path.exists(old_filepath):
-                os.remove(old_filepath)
+        if image_queue_full('service', service.id):
+            return "Image processing is busy, please try again shortly", 503
 
         # Generate filename (use service ID to ensure uniqueness)
         filename = secure_filename(f"service_{service_id}.jpg")
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
 
-        # Save the file
-        file.save(filepath)
+        # Queue the file; the service points at it once processing finishes
+        # and an older image under another name is deleted then
+        try:
+            queue_image(file, 'service', service_id, app.config['UPLOAD_FOLDER'], filename)
+        except ImageQueueFull:
+            return "Image processing is busy, please try again shortly", 503
 
-        # Update the service with the image filename
-        service.image_filename = filename
-        db.session.commit()
-
-        return redirect(url_for('admin_panel', _anchor=f'service-{service_id}'))
+        return admin_redirect(f'service-{service_id}', service_id=service_id)
 
     return "Invalid file type", 400
 
@@ -452,7 +2313,7 @@ def upload_service_image(service_id):
 def delete_category(category_id):
     category = Category.query.get_or_404(category_id)
     db.session.delete(category)
-    db.session.commit()
+    commit_catalog()
     return redirect(url_for('admin_panel'))
 
 
@@ -461,7 +2322,7 @@ def delete_category(category_id):
 def delete_subcategory(category_id, subcategory_id):
     subcategory = Subcategory.query.get_or_404(subcategory_id)
     db.session.delete(subcategory)
-    db.session.commit()
+    commit_catalog()
     return redirect(url_for('admin_panel', _anchor=f'category-{category_id}'))
 
 
@@ -470,8 +2331,8 @@ def delete_subcategory(category_id, subcategory_id):
 def delete_service(category_id, subcategory_id, service_id):
     service = Service.query.get_or_404(service_id)
     db.session.delete(service)
-    db.session.commit()
-    return redirect(url_for('admin_panel', _anchor=f'subcat-{subcategory_id}'))
+    commit_catalog()
+    return admin_redirect(f'subcat-{subcategory_id}', subcategory_id=subcategory_id)
 
 
 
@@ -485,8 +2346,8 @@ def add_subcategory(category_id):
     if name:
         new_subcategory = Subcategory(name=name, category_id=category_id)
         db.session.add(new_subcategory)
-        db.session.commit()
-        return redirect(url_for('admin_panel', _anchor=f'subcat-{new_subcategory.id}'))
+        commit_catalog()
+        return admin_redirect(f'subcat-{new_subcategory.id}', subcategory_id=new_subcategory.id)
     return redirect(url_for('admin_panel'))
 
 @app.route('/admin/add_service/<int:category_id>/<int:subcategory_id>', methods=['POST'])
@@ -505,8 +2366,8 @@ def add_service(category_id, subcategory_id):
             subcategory_id=subcategory_id
         )
         db.session.add(new_service)
-        db.session.commit()
-        return redirect(url_for('admin_panel', _anchor=f'service-{new_service.id}'))
+        commit_catalog()
+        return admin_redirect(f'service-{new_service.id}', service_id=new_service.id)
     return redirect(url_for('admin_panel'))
 
 # Variant operations
@@ -533,9 +2394,9 @@ def add_variant(service_id):
             service_id=service_id
         )
         db.session.add(new_variant)
-        db.session.commit()
-        return redirect(url_for('admin_panel', _anchor=f'variant-{new_variant.id}'))
-    return redirect(url_for('admin_panel', _anchor=f'service-{service_id}'))
+        commit_catalog()
+        return admin_redirect(f'variant-{new_variant.id}', service_id=service_id)
+    return admin_redirect(f'service-{service_id}', service_id=service_id)
 
 @app.route('/admin/update_variant/<int:variant_id>', methods=['POST'])
 @login_required
@@ -562,8 +2423,8 @@ def update_variant(variant_id):
     variant.unit = unit
     variant.available = available
 
-    db.session.commit()
-    return redirect(url_for('admin_panel', _anchor=f'variant-{variant_id}'))
+    commit_catalog()
+    return admin_redirect(f'variant-{variant_id}', service_id=variant.service_id)
 
 @app.route('/admin/delete_variant/<int:variant_id>')
 @login_required
@@ -571,8 +2432,60 @@ def delete_variant(variant_id):
     variant = Variant.query.get_or_404(variant_id)
     service_id = variant.service_id
     db.session.delete(variant)
-    db.session.commit()
-    return redirect(url_for('admin_panel', _anchor=f'service-{service_id}'))
+    commit_catalog()
+    return admin_redirect(f'service-{service_id}', service_id=service_id)
+# Bulk import/export
+@app.route('/admin/export_catalog.<fmt>')
+@login_required
+def export_catalog(fmt):
+    if fmt not in ('csv', 'json'):
+        return "Unknown export format", 404
+    # Streamed from the immutable snapshot, so no query stays open meanwhile
+    services_data = get_services_data()
+    chunks = export_catalog_csv(services_data) if fmt == 'csv' else export_catalog_json(services_data)
+    response = app.response_class(chunks, mimetype='text/csv' if fmt == 'csv' else 'application/json')
+    response.headers['Content-Disposition'] = f'attachment; filename=catalog-v{_catalog["version"]}.{fmt}'
+    return response
+
+@app.route('/admin/import_catalog', methods=['POST'])
+@login_required
+def import_catalog():
+    file = request.files.get('file')
+    if not file or not file.filename:
+        return "No file uploaded", 400
+    fmt = 'json' if file.filename.lower().endswith('.json') else 'csv'
+    stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+    report = import_catalog_file(stream, fmt, dry_run=bool(request.form.get('dry_run')))
+    return render_template('import_report.html', report=report, filename=file.filename)
+
+@app.route('/admin/bulk_update', methods=['POST'])
+@login_required
+def bulk_update():
+    payload = request.get_json(silent=True)
+    changes = payload.get('changes') if isinstance(payload, dict) else None
+    if not isinstance(changes, list) or not changes:
+        return jsonify(error='Expected a JSON body like {"changes": [...]}'), 400
+    statements = []
+    for index, change in enumerate(changes):
+        try:
+            statements.append(bulk_update_statement(change))
+        except BulkUpdateError as e:
+            return jsonify(error=f"Change {index}: {e}"), 400
+
+    results = [
+        db.session.execute(statement, execution_options={'synchronize_session': False}).rowcount
+        for statement in statements
+    ]
+    changed = {target: 0 for target in BULK_TARGETS}
+    for change, count in zip(changes, results):
+        changed[change['target']] += count
+    if any(results):
+        commit_catalog()
+    else:
+        db.session.rollback()
+        get_services_data()
+    return jsonify(version=_catalog["version"], changed=changed, results=results)
+
 @app.route('/admin/toggle_shop_status', methods=['POST'])
 @login_required
 def toggle_shop_status():
@@ -582,7 +2495,7 @@ def toggle_shop_status():
         db.session.add(status)
 
     status.is_open = not status.is_open
-    db.session.commit()
+    commit_catalog()
     return redirect(url_for('admin_panel'))
 
 @app.route('/admin/update_closed_message', methods=['POST'])
@@ -596,7 +2509,24 @@ def update_closed_message():
             db.session.add(status)
         else:
             status.message = new_message
-        db.session.commit()
+        commit_catalog()
+    return redirect(url_for('admin_panel'))
+
+@app.route('/admin/update_business_hours', methods=['POST'])
+@login_required
+def update_business_hours():
+    rows = []
+    for weekday, day in enumerate(WEEKDAYS):
+        try:
+            windows = parse_hours(request.form.get(f'hours_{weekday}', ''))
+        except ValueError as e:
+            return f"Invalid business hours for {day}: '{e}', use HH:MM-HH:MM", 400
+        rows.extend(BusinessHours(weekday=weekday, opens=opens, closes=closes) for opens, closes in windows)
+
+    # The whole schedule is replaced; leaving every day empty removes it
+    db.session.execute(db.delete(BusinessHours))
+    db.session.add_all(rows)
+    commit_catalog()
     return redirect(url_for('admin_panel'))
 
 @app.route('/menu')
@@ -611,12 +2541,115 @@ def terms():
 def about():
     return render_template('about.html')
 
-if __name__ == '__main__':
-    # Create necessary directories if they don't exist
-    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Application startup
+# Importing this module does no database I/O. create_app() binds the database
+# and installs the optional hooks, and is safe to call more than once. The
+# schema is created by 'flask init-db' (and demo data by 'flask seed') as a
+# deploy step, not by every worker at boot. With WARM_CATALOG=1 the catalog
+# snapshot is built in the process calling create_app(), e.g. a gunicorn
+# master started with --preload, and the forked workers share it. CLI
+# commands skip that (init-db runs before the schema exists), and so does a
+# database without the catalog tables; workers then load it on first use.
+def create_app(config=None):
+    if config:
+        app.config.update(config)
+    if 'sqlalchemy' not in app.extensions:
+        # Create necessary directories if they don't exist
+        os.makedirs(app.config['CATEGORY_UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        if make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name() == 'sqlite':
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = dict(
+                app.config['SQLALCHEMY_ENGINE_OPTIONS'], connect_args=app.config['SQLITE_CONNECT_ARGS']
+            )
+        db.init_app(app)
+        with app.app_context():
+            if db.engine.dialect.name == 'sqlite':
+                event.listen(db.engine, 'connect', set_sqlite_pragmas)
+        if app.config['METRICS_ENABLED']:
+            install_metrics()
+        order_messages.configure(
+            load_template(app.config['ORDER_MESSAGE_TEMPLATE']),
+            app.config['WHATSAPP_NUMBER'],
+            app.config['WHATSAPP_MAX_URL_LENGTH'],
+        )
+    if app.config['WARM_CATALOG'] and click.get_current_context(silent=True) is None:
+        warm_up()
+    return app
+
+def warm_up():
+    with app.app_context():
+        inspector = db.inspect(db.engine)
+        if all(inspector.has_table(model.__tablename__) for model in (
+            CatalogVersion, Category, Subcategory, Service, Variant, ShopStatus, BusinessHours
+        )):
+            refresh_catalog()
+        # Workers must not inherit the connection used for the warmup
+        db.engine.dispose()
+    # Move the snapshot out of the collector's reach so GC passes in the
+    # workers do not write to (and so copy) the shared pages
+    gc.freeze()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables, indexes and status rows."""
+    create_app()
+    init_db()
+    click.echo(f"Initialized {db.engine.url.render_as_string(hide_password=True)}")
+
+@app.cli.command('seed')
+def seed_command():
+    """Add the demo catalog to an empty database."""
+    create_app()
+    init_db()
+    click.echo("Seeded demo catalog" if seed_db() else "Catalog is not empty, nothing to seed")
+
+@app.cli.command('backfill-analytics')
+def backfill_analytics_command():
+    """Rebuild the sales rollups from all recorded orders."""
+    create_app()
+    init_db()
+    start = time.perf_counter()
+    orders = backfill_rollups()
+    click.echo(f"Rolled up {orders} orders in {time.perf_counter() - start:.1f}s")
+
+@app.cli.command('export-catalog')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+def export_catalog_command(path):
+    """Write the catalog to a .csv or .json file."""
+    create_app()
+    services_data = get_services_data()
+    export = export_catalog_json if path.lower().endswith('.json') else export_catalog_csv
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for chunk in export(services_data):
+            f.write(chunk)
+    click.echo(f"Exported catalog version {_catalog['version']} to {path}")
+
+@app.cli.command('import-catalog')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Only report the changes.')
+def import_catalog_command(path, dry_run):
+    """Replace the catalog with the contents of a .csv or .json file."""
+    create_app()
+    fmt = 'json' if path.lower().endswith('.json') else 'csv'
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        report = import_catalog_file(f, fmt, dry_run=dry_run)
+    click.echo(f"{report['rows']} rows")
+    for kind, counts in report["changes"].items():
+        click.echo(f"  {kind}: " + ", ".join(f"{count} to {action}" for action, count in counts.items()))
+    for error in report["errors"]:
+        click.echo(f"  {error}")
+    if report["error_count"]:
+        raise click.ClickException(f"{report['error_count']} rows have errors, nothing was imported")
+    click.echo("Applied" if report["applied"] else "Dry run, nothing was changed")
 
-    # Print database location for verification
-    print(f"Database will be created at: {os.path.join(basedir, 'services.db')}")
-    print(f"Upload folder is at: {app.config['UPLOAD_FOLDER']}")
+if __name__ == '__main__':
+    create_app()
+    with app.app_context():
+        init_db()
+        seed_db()
+
+        # Print database location for verification
+        print(f"Database is at: {db.engine.url.database}")
+        print(f"Upload folder is at: {app.config['UPLOAD_FOLDER']}")
 
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""Sales rollups over a large synthetic order log.
+
+For each order count a fresh interpreter seeds a throwaway database with a
+600 variant catalog and that many orders (1-5 lines each) spread over a
+year, then times:
+
+  * backfill_rollups() over the whole log
+  * the rollup work added to one order writer batch of --batch orders
+  * GET /admin/analytics, which reads the rollups, against the same
+    report (30 daily totals, 24 hourly totals, top variants) computed by
+    scanning the orders
+
+    python benchmarks/analytics.py --orders 100000,1000000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHAPE = (4, 5, 10, 3)  # 600 variants
+INSERT_CHUNK = 20000
+
+SCAN_DAILY = """
+SELECT date(datetime(o.created_at, '+330 minutes')) AS day, count(DISTINCT o.id), sum(i.quantity), sum(i.subtotal)
+FROM "order" o JOIN order_item i ON i.order_id = o.id
+WHERE o.created_at >= :first AND o.created_at < :last GROUP BY day
+"""
+SCAN_HOURLY = """
+SELECT strftime('%H', datetime(o.created_at, '+330 minutes')) AS hour, count(DISTINCT o.id), sum(i.quantity), sum(i.subtotal)
+FROM "order" o JOIN order_item i ON i.order_id = o.id
+WHERE o.created_at >= :day_first AND o.created_at < :last GROUP BY hour
+"""
+SCAN_TOP = """
+SELECT i.variant_id, count(DISTINCT o.id), sum(i.quantity), sum(i.subtotal) AS revenue
+FROM "order" o JOIN order_item i ON i.order_id = o.id
+WHERE o.created_at >= :day_first AND o.created_at < :last GROUP BY i.variant_id ORDER BY revenue DESC LIMIT 10
+"""
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def order_data(rng, keys, entities, created_at):
+    items = []
+    for service_id, variant_id in rng.sample(keys, rng.randint(1, 5)):
+        variant = entities["variants"][variant_id]
+        service = entities["services"][service_id]
+        subcategory = entities["subcategories"][service["subcategory_id"]]
+        category = entities["categories"][subcategory["category_id"]]
+        quantity = rng.randint(1, 4)
+        items.append({
+            "category_id": category["id"], "subcategory_id": subcategory["id"],
+            "service_id": service_id, "variant_id": variant_id,
+            "category": category["name"], "subcategory": subcategory["name"],
+            "name": service["name"], "variant": variant["name"], "unit": variant["unit"],
+            "price": variant["price"], "quantity": quantity, "subtotal": quantity * variant["price"],
+        })
+    return {
+        "created_at": created_at, "name": "Bench", "phone": "9999999999", "address": "Ranchi",
+        "payment_mode": "Cash", "total": sum(item["subtotal"] for item in items), "items": items,
+    }
+
+
+def seed_orders(shop, count, keys, entities, end):
+    db = shop.db
+    rng = random.Random(1)
+    start = end - timedelta(days=365)
+    step = (end - start) / count
+    order_id = 0
+    while order_id < count:
+        orders, items = [], []
+        for _ in range(min(INSERT_CHUNK, count - order_id)):
+            order_id += 1
+            # Ids follow time, as in the real order log
+            data = order_data(rng, keys, entities, start + step * (order_id - rng.random()))
+            orders.append({key: data[key] for key in ("created_at", "name", "phone", "address", "payment_mode", "total")})
+            orders[-1]["id"] = order_id
+            for item in data["items"]:
+                items.append({
+                    "order_id": order_id, "category_id": item["category_id"], "subcategory_id": item["subcategory_id"],
+                    "service_id": item["service_id"], "variant_id": item["variant_id"], "category": item["category"],
+                    "subcategory": item["subcategory"], "service_name": item["name"], "variant_name": item["variant"],
+                    "unit": item["unit"], "price": item["price"], "quantity": item["quantity"], "subtotal": item["subtotal"],
+                })
+        db.session.execute(db.insert(shop.Order), orders)
+        db.session.execute(db.insert(shop.OrderItem), items)
+        db.session.commit()
+
+
+def run_one(orders, batch, runs):
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    sys.path.insert(0, ROOT)
+    import app as shop
+    import suite
+
+    shop.create_app()
+    keys = suite.seed_catalog(shop, SHAPE)
+    end = datetime.now(timezone.utc).replace(tzinfo=None)
+    results = {}
+    with shop.app.app_context():
+        entities = shop.get_services_data().entities()
+        start = time.perf_counter()
+        seed_orders(shop, orders, keys, entities, end)
+        results["seed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        shop.backfill_rollups()
+        results["backfill"] = time.perf_counter() - start
+        results["rollup_rows"] = shop.db.session.execute(shop.db.select(shop.db.func.count()).select_from(shop.SalesRollup)).scalar()
+
+        # One writer batch: the rollup part alone, then the whole save_orders()
+        rng = random.Random(2)
+        make_batch = lambda: [order_data(rng, keys, entities, end) for _ in range(batch)]
+
+        def rollup_only():
+            rollups = shop.RollupBatch(shop.SHOP_TIMEZONE)
+            for data in make_batch():
+                rollups.add(data["created_at"], data["items"])
+            shop.apply_rollups(rollups)
+            shop.db.session.commit()
+
+        results["batch_rollups"] = timed(rollup_only, runs)
+        results["batch_save_orders"] = timed(lambda: shop.save_orders(make_batch()), runs)
+
+        day = datetime.now(shop.SHOP_TIMEZONE).replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+        ist = timedelta(hours=5, minutes=30)
+        params = {"first": day - timedelta(days=29) - ist, "day_first": day - ist, "last": day + timedelta(days=1) - ist}
+
+        def scan():
+            for statement in (SCAN_DAILY, SCAN_HOURLY, SCAN_TOP):
+                shop.db.session.execute(shop.db.text(statement), params).all()
+
+        results["report_scan"] = timed(scan, runs)
+
+    client = shop.app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+    results["report_rollups"] = timed(lambda: client.get("/admin/analytics"), runs)
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", default="100000,1000000")
+    parser.add_argument("--batch", type=int, default=50, help="orders per writer batch")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size:
+        run_one(args.size, args.batch, args.runs)
+        return
+
+    for orders in map(int, args.orders.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tmp, "bench.db"))
+            out = subprocess.run(
+                [sys.executable, __file__, "--size", str(orders), "--batch", str(args.batch), "--runs", str(args.runs)],
+                env=env, check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+        result = json.loads(out.splitlines()[-1])
+        print(f"{orders:>9,} orders: seeded in {result['seed']:.1f}s, "
+              f"backfill {result['backfill']:.1f}s ({result['rollup_rows']:,} rollup rows)")
+        print(f"{'':>17} batch of {args.batch}: rollups {result['batch_rollups'] * 1000:.1f} ms, "
+              f"whole save_orders {result['batch_save_orders'] * 1000:.1f} ms")
+        print(f"{'':>17} report: from rollups {result['report_rollups'] * 1000:.1f} ms, "
+              f"scanning orders {result['report_scan'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
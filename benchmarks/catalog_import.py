@@ -0,0 +1,146 @@
+"""Bulk catalog import of a large synthetic file.
+
+Writes a catalog of --variants variants (CSV and JSON) to a temp directory,
+then, against a throwaway database, times:
+
+  * the first import into an empty catalog (all inserts)
+  * re-importing the same file (a diff with no changes)
+  * a dry run and an import of a file with changed prices and dropped rows
+  * exporting the result again
+
+For every step it reports the wall time and the peak Python heap allocated
+during the step (tracemalloc, disable with --no-heap), next to the size of
+the file.
+
+    python benchmarks/catalog_import.py --variants 50000
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMNS = (
+    'category_id', 'category', 'category_image',
+    'subcategory_id', 'subcategory',
+    'service_id', 'service', 'service_available', 'description', 'service_image',
+    'variant_id', 'variant', 'price', 'unit', 'variant_available',
+)
+
+
+def synthetic_rows(variants, price_bump=0, drop_every=0):
+    # 10 categories x 10 subcategories, 5 variants per service; no ids, so
+    # re-imports match rows by name
+    services = max(1, variants // 5)
+    for service in range(services):
+        subcategory = service % 100
+        for variant in range(5):
+            if drop_every and (service * 5 + variant) % drop_every == 0:
+                continue
+            yield {
+                'category': f"Category {subcategory // 10}",
+                'subcategory': f"Subcategory {subcategory}",
+                'service': f"Service {service}",
+                'service_available': 1,
+                'description': "Synthetic benchmark service",
+                'variant': f"Variant {variant}",
+                'price': 50 + variant * 10 + (price_bump if service % 10 == 0 else 0),
+                'unit': "per plate",
+                'variant_available': 1,
+            }
+
+
+def write_file(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if path.endswith('.json'):
+            f.write('[')
+            for count, row in enumerate(rows):
+                f.write((',\n' if count else '\n') + json.dumps(row))
+            f.write('\n]\n')
+        else:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def timed(label, fn, heap=True):
+    # tracemalloc slows allocation-heavy code down, so --no-heap gives cleaner times
+    if heap:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = f"  peak heap {tracemalloc.get_traced_memory()[1] / 1e6:7.1f} MB" if heap else ""
+    tracemalloc.stop()
+    print(f"  {label:<28} {elapsed * 1000:9.1f}ms{peak}")
+    return result
+
+
+def run(args):
+    sys.path.insert(0, ROOT)
+    import app as shop
+
+    shop.create_app()
+    with shop.app.app_context():
+        shop.init_db()
+
+    def load(path, dry_run=False):
+        fmt = 'json' if path.endswith('.json') else 'csv'
+        with shop.app.app_context(), open(path, encoding='utf-8', newline='') as f:
+            report = shop.import_catalog_file(f, fmt, dry_run=dry_run)
+        if report["error_count"]:
+            sys.exit(f"Import failed: {report['errors']}")
+        return report
+
+    def export(path):
+        with shop.app.app_context(), open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in shop.export_catalog_csv(shop.get_services_data()):
+                f.write(chunk)
+
+    base = os.path.join(args.tmp, f"catalog.{args.fmt}")
+    changed = os.path.join(args.tmp, f"changed.{args.fmt}")
+    size = os.path.getsize(base) / 1e6
+    print(f"{args.fmt.upper()}: {args.variants} variants, {size:.1f} MB")
+
+    report = timed("import into empty catalog", lambda: load(base), args.heap)
+    print(f"    {report['changes']['variants']}")
+    report = timed("re-import unchanged", lambda: load(base), args.heap)
+    print(f"    {report['changes']['variants']}")
+    report = timed("dry run of changes", lambda: load(changed, dry_run=True), args.heap)
+    print(f"    {report['changes']['variants']}")
+    timed("import changes", lambda: load(changed), args.heap)
+    timed("export csv", lambda: export(os.path.join(args.tmp, "export.csv")), args.heap)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", type=int, default=50000)
+    parser.add_argument("--formats", default="csv,json")
+    parser.add_argument("--no-heap", dest="heap", action="store_false", help="skip tracemalloc")
+    parser.add_argument("--fmt", help=argparse.SUPPRESS)
+    parser.add_argument("--tmp", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.fmt:
+        run(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in args.formats.split(","):
+            write_file(os.path.join(tmp, f"catalog.{fmt}"), synthetic_rows(args.variants))
+            write_file(os.path.join(tmp, f"changed.{fmt}"), synthetic_rows(args.variants, price_bump=5, drop_every=50))
+            env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tmp, f"{fmt}.db"))
+            subprocess.run(
+                [sys.executable, __file__, "--variants", str(args.variants), "--fmt", fmt, "--tmp", tmp]
+                + ([] if args.heap else ["--no-heap"]),
+                env=env, check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
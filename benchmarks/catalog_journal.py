@@ -0,0 +1,110 @@
+"""Applying catalog edits from the change journal against reloading the catalog.
+
+For each catalog size a fresh interpreter seeds a throwaway database and
+builds the snapshot, then commits single admin edits as another worker
+would (journaled, but without touching this worker's snapshot) and times
+update_catalog() bringing the snapshot up to date, against a full
+refresh_catalog(). A burst of --burst edits is applied in one update, as
+after the coalescing window. After every update the snapshot is checked
+against one loaded from scratch.
+
+    python benchmarks/catalog_journal.py --variants 10000,100000 --burst 50
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def shape_for(variants):
+    # 10 categories x 10 subcategories, 4 variants per service
+    return (10, 10, max(1, variants // 400), 4)
+
+
+def run_one(variants, burst, runs):
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    sys.path.insert(0, ROOT)
+    import app as shop
+    import suite
+
+    shop.create_app()
+    keys = suite.seed_catalog(shop, shape_for(variants))
+    db = shop.db
+    services = sorted({service_id for service_id, _ in keys})
+    variant_ids = iter(variant_id for _, variant_id in keys)
+    edits = {
+        "variant price": lambda i: setattr(db.session.get(shop.Variant, next(variant_ids)), "price", i),
+        "service rename": lambda i: setattr(db.session.get(shop.Service, services[i]), "name", f"Renamed {i}"),
+        "category rename": lambda i: setattr(db.session.get(shop.Category, 1 + i % 10), "name", f"Category {i}"),
+        "add variant": lambda i: db.session.add(
+            shop.Variant(name=f"New {i}", price=10, unit="per plate", available=True, service_id=services[i])
+        ),
+        "delete variant": lambda i: db.session.delete(db.session.get(shop.Variant, next(variant_ids))),
+    }
+
+    def commit(edit, i):
+        edit(i)
+        shop.journal_catalog()
+        db.session.commit()
+
+    def timed_update():
+        start = time.perf_counter()
+        shop.update_catalog()
+        elapsed = time.perf_counter() - start
+        assert shop.get_services_data().to_dict() == shop.load_services_data().to_dict()
+        return elapsed
+
+    results = {}
+    with shop.app.app_context():
+        shop.refresh_catalog()
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            shop.refresh_catalog()
+            samples.append(time.perf_counter() - start)
+        results["full reload"] = statistics.median(samples)
+
+        for name, edit in edits.items():
+            samples = []
+            for i in range(runs):
+                commit(edit, i)
+                samples.append(timed_update())
+            results[name] = statistics.median(samples)
+
+        for i in range(burst):
+            commit(edits["variant price"], i)
+        results[f"{burst} price edits"] = timed_update()
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", default="10000,100000")
+    parser.add_argument("--burst", type=int, default=50, help="edits applied in one update")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size:
+        run_one(args.size, args.burst, args.runs)
+        return
+
+    for variants in map(int, args.variants.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tmp, "bench.db"))
+            out = subprocess.run(
+                [sys.executable, __file__, "--size", str(variants), "--burst", str(args.burst), "--runs", str(args.runs)],
+                env=env, check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+        for name, seconds in json.loads(out.splitlines()[-1]).items():
+            print(f"{variants:>7} variants  {name:<16} {seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
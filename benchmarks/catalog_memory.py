@@ -0,0 +1,164 @@
+"""Resident memory of the in-memory catalog snapshot.
+
+For each catalog size, two fresh interpreters seed a throwaway database
+and load the catalog snapshot:
+
+  * previous: ORM objects loaded with joinedload, nested dicts frozen with
+    MappingProxyType, plus the flat price index and entity maps built
+    from them (the structure refresh_catalog() kept before the compact
+    catalog)
+  * compact: refresh_catalog() as it is now
+
+Each reports the RSS growth while the request's session still holds the
+loaded rows and after the session is closed, i.e. what every worker keeps.
+
+    python benchmarks/catalog_memory.py --variants 1000,10000,100000
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from types import MappingProxyType
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE / 1e6
+
+
+def shape_for(variants):
+    # 10 categories x 10 subcategories, 4 variants per service
+    return (10, 10, max(1, variants // 400), 4)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def previous_snapshot(shop):
+    # The nested dict snapshot with its price index and entity maps
+    categories = shop.Category.query.options(
+        shop.db.joinedload(shop.Category.subcategories)
+        .joinedload(shop.Subcategory.services)
+        .joinedload(shop.Service.variants)
+    ).all()
+    services_data = {"categories": []}
+    for category in categories:
+        cat_dict = {
+            "id": category.id, "name": category.name, "image_filename": category.image_filename,
+            "image_widths": (), "image_version": None, "subcategories": [],
+        }
+        for subcategory in category.subcategories:
+            sub_dict = {"id": subcategory.id, "name": subcategory.name, "services": []}
+            for service in subcategory.services:
+                service_dict = {
+                    "id": service.id, "name": service.name, "available": service.available,
+                    "description": service.description, "image_filename": service.image_filename,
+                    "image_widths": (), "image_version": None, "variants": [],
+                }
+                for variant in service.variants:
+                    service_dict["variants"].append({
+                        "id": variant.id, "name": variant.name, "price": variant.price,
+                        "unit": variant.unit, "available": variant.available,
+                    })
+                sub_dict["services"].append(service_dict)
+            cat_dict["subcategories"].append(sub_dict)
+        services_data["categories"].append(cat_dict)
+    services_data = _freeze(services_data)
+
+    price_index = {}
+    entities = {"categories": {}, "subcategories": {}, "services": {}, "variants": {}}
+    for category in services_data["categories"]:
+        message_category = shop.order_messages.compile_category(category["name"])
+        entities["categories"][category["id"]] = {
+            key: category[key] for key in ("id", "name", "image_filename", "image_version")
+        }
+        for subcategory in category["subcategories"]:
+            entities["subcategories"][subcategory["id"]] = {
+                "id": subcategory["id"], "category_id": category["id"], "name": subcategory["name"],
+            }
+            for service in subcategory["services"]:
+                entities["services"][service["id"]] = {
+                    "id": service["id"], "subcategory_id": subcategory["id"], "name": service["name"],
+                    "available": service["available"], "description": service["description"],
+                    "image_filename": service["image_filename"], "image_widths": [], "image_version": None,
+                }
+                for variant in service["variants"]:
+                    item = {
+                        "category_id": category["id"], "subcategory_id": subcategory["id"],
+                        "service_id": service["id"], "variant_id": variant["id"],
+                        "name": service["name"], "variant": variant["name"], "price": variant["price"],
+                        "unit": variant["unit"], "category": category["name"],
+                        "subcategory": subcategory["name"], "available": bool(variant["available"]),
+                    }
+                    item["message_category"] = message_category
+                    item["message_line"] = shop.order_messages.compile_item(item)
+                    price_index[(service["id"], variant["id"])] = MappingProxyType(item)
+                    entities["variants"][variant["id"]] = {
+                        "id": variant["id"], "service_id": service["id"], "name": variant["name"],
+                        "price": variant["price"], "unit": variant["unit"], "available": variant["available"],
+                    }
+    shop.search_index.update(entities)
+    return services_data, MappingProxyType(price_index), entities
+
+
+def run_one(mode, variants):
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    sys.path.insert(0, ROOT)
+    import app as shop
+    import suite
+
+    shop.create_app()
+    suite.seed_catalog(shop, shape_for(variants))
+    with shop.app.app_context():
+        shop.db.session.remove()
+        gc.collect()
+        before = rss_mb()
+        snapshot = previous_snapshot(shop) if mode == "previous" else shop.refresh_catalog()
+        gc.collect()
+        with_session = rss_mb() - before
+        shop.db.session.remove()
+    gc.collect()
+    retained = rss_mb() - before
+    print(json.dumps({"with_session": with_session, "retained": retained, "alive": snapshot is not None}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", default="1000,10000,100000")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_one(args.mode, args.size)
+        return
+
+    for variants in map(int, args.variants.split(",")):
+        results = {}
+        for mode in ("previous", "compact"):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tmp, "bench.db"))
+                out = subprocess.run(
+                    [sys.executable, __file__, "--mode", mode, "--size", str(variants)],
+                    env=env, check=True, stdout=subprocess.PIPE, text=True,
+                ).stdout
+                results[mode] = json.loads(out.splitlines()[-1])
+        for mode, result in results.items():
+            print(f"{variants:>7} variants {mode:<9} RSS +{result['with_session']:7.1f} MB with session, "
+                  f"+{result['retained']:7.1f} MB retained "
+                  f"({result['retained'] * 1e6 / variants:6.0f} bytes/variant)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Cold start time of a worker process.
+
+Each run starts a fresh interpreter against a throwaway copy of services.db
+and times three phases: importing app, getting a ready application (the
+create_app() factory when present) and serving the first GET /. The copy is
+brought up to date with init_db() first, like a deploy running init-db.
+
+    python benchmarks/cold_start.py --runs 20
+    WARM_CATALOG=1 python benchmarks/cold_start.py
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app as shop
+imported = time.perf_counter()
+application = shop.create_app() if hasattr(shop, 'create_app') else shop.app
+ready = time.perf_counter()
+status = application.test_client().get('/').status_code
+served = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "ready": ready - start,
+    "first_request": served - start,
+    "status": status,
+}))
+"""
+
+SETUP = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import app as shop
+if hasattr(shop, 'init_db'):
+    with shop.create_app().app_context():
+        shop.init_db()
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--root", default=ROOT, help="checkout to measure")
+    args = parser.parse_args()
+
+    samples = {"import": [], "ready": [], "first_request": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "services.db")
+        shutil.copy(os.path.join(args.root, "services.db"), db_path)
+        env = dict(os.environ, DATABASE_URL="sqlite:///" + db_path, WARM_CATALOG="0")
+        subprocess.run([sys.executable, "-c", SETUP, args.root], env=env, check=True, cwd=tmp)
+        env["WARM_CATALOG"] = os.environ.get("WARM_CATALOG", "0")
+        for _ in range(args.runs):
+            out = subprocess.run(
+                [sys.executable, "-c", CHILD, args.root],
+                env=env, check=True, stdout=subprocess.PIPE, text=True, cwd=tmp,
+            ).stdout
+            result = json.loads(out.splitlines()[-1])
+            if result["status"] != 200:
+                sys.exit(f"GET / returned {result['status']}")
+            for phase in samples:
+                samples[phase].append(result[phase] * 1000)
+
+    for phase, ms in samples.items():
+        print(f"{phase:<14} median={statistics.median(ms):8.1f}ms min={min(ms):8.1f}ms max={max(ms):8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Search index latency over a synthetic catalog.
+
+Builds a SearchIndex from synthetic catalog entities (10k services by
+default), then times a full build, an incremental update after one edit,
+and queries covering exact, prefix, typo and multi-word searches.
+
+    python benchmarks/search_latency.py --services 10000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import SearchIndex  # noqa: E402
+
+WORDS = [
+    "paneer", "chicken", "veg", "biryani", "thali", "dal", "roti", "rice", "masala", "butter",
+    "palak", "aloo", "gobi", "mutton", "egg", "curry", "fried", "tandoori", "kadhai", "jeera",
+    "special", "mix", "raita", "salad", "chapati", "paratha", "khichdi", "sabzi", "mess", "tiffin",
+]
+QUERIES = ["biryani", "pan", "chiken", "veg thali", "butter masala", "tandori", "mess tiffin", "zz"]
+
+
+def synthetic_entities(services, variants_per_service, seed=1):
+    rng = random.Random(seed)
+    entities = {"categories": {}, "subcategories": {}, "services": {}, "variants": {}}
+    for category_id in range(1, 11):
+        entities["categories"][category_id] = {"id": category_id, "name": f"Category {category_id}"}
+    for subcategory_id in range(1, 101):
+        entities["subcategories"][subcategory_id] = {
+            "id": subcategory_id,
+            "category_id": (subcategory_id - 1) // 10 + 1,
+            "name": " ".join(rng.sample(WORDS, 2)),
+        }
+    variant_id = 0
+    for service_id in range(1, services + 1):
+        entities["services"][service_id] = {
+            "id": service_id,
+            "subcategory_id": rng.randint(1, 100),
+            "name": " ".join(rng.sample(WORDS, 3)) + f" {service_id}",
+            "description": " ".join(rng.choices(WORDS, k=12)),
+            "available": True,
+        }
+        for _ in range(variants_per_service):
+            variant_id += 1
+            entities["variants"][variant_id] = {
+                "id": variant_id,
+                "service_id": service_id,
+                "name": rng.choice(["Half", "Full", "Family pack", "Single", "Combo"]),
+                "price": rng.randint(40, 400),
+                "available": rng.random() > 0.1,
+            }
+    return entities
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--services', type=int, default=10000)
+    parser.add_argument('--variants', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    entities = synthetic_entities(args.services, args.variants)
+    index = SearchIndex()
+
+    start = time.perf_counter()
+    index.update(entities)
+    print(f"build: {len(index)} services in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    entities["services"][1] = dict(entities["services"][1], name="renamed paneer special")
+    start = time.perf_counter()
+    changed = index.update(entities)
+    print(f"incremental update: {changed} changed in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            results = index.search(query, 10)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"{query!r:>16}: {len(results):2d} results  p50={statistics.median(samples):.3f}ms "
+              f"p95={percentile(samples, 95):.3f}ms p99={percentile(samples, 99):.3f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Storefront read latency while admin writes are in flight.
+
+Runs reader threads that rebuild the catalog (the query behind every
+snapshot reload) while a writer thread keeps committing variant updates,
+once per journal mode, against a throwaway copy of services.db.
+
+    python benchmarks/sqlite_contention.py --seconds 5 --readers 4
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(seconds, readers):
+    sys.path.insert(0, ROOT)
+    import app as shop
+
+    shop.create_app()
+    stop = threading.Event()
+    latencies = []
+    writes = [0]
+
+    def reader():
+        with shop.app.app_context():
+            while not stop.is_set():
+                start = time.perf_counter()
+                shop.load_services_data()
+                latencies.append(time.perf_counter() - start)
+                shop.db.session.remove()
+
+    def writer():
+        with shop.app.app_context():
+            while not stop.is_set():
+                shop.db.session.execute(shop.db.update(shop.Variant).values(price=shop.Variant.price + 1))
+                shop.db.session.commit()
+                writes[0] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    ms = [latency * 1000 for latency in latencies]
+    print(f"  reads={len(ms)} writes={writes[0]} "
+          f"p50={statistics.median(ms):.2f}ms p95={percentile(ms, 95):.2f}ms "
+          f"p99={percentile(ms, 99):.2f}ms max={max(ms):.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--modes', default='DELETE,WAL')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(args.seconds, args.readers)
+        return
+
+    for mode in args.modes.split(','):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'services.db')
+            shutil.copyfile(os.path.join(ROOT, 'services.db'), db_path)
+            env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path, SQLITE_JOURNAL_MODE=mode)
+            print(f"journal_mode={mode}")
+            subprocess.run(
+                [sys.executable, __file__, '--run', '--seconds', str(args.seconds), '--readers', str(args.readers)],
+                env=env, check=True
+            )
+
+
+if __name__ == '__main__':
+    main()
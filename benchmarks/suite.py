@@ -0,0 +1,381 @@
+"""Benchmark and load-test suite for the storefront, order and admin paths.
+
+Every catalog size runs in its own interpreter against a freshly seeded,
+throwaway SQLite database, so nothing touches services.db. For each size
+it measures, through the Flask test client:
+
+  * load_services_data() (the raw query) and refresh_catalog() (a reload)
+  * GET / and GET /api/catalog, uncached and cached
+  * POST /submit_order and POST /api/cart/quote with carts of several sizes
+  * GET /admin/panel
+
+It then starts a local multi-process WSGI server and load-tests the main
+routes over HTTP. Results include p50/p95/p99 latency, throughput and
+peak RSS.
+
+    python benchmarks/suite.py --sizes small,medium
+    python benchmarks/suite.py --sizes small --save-baseline benchmarks/baselines/small.json
+    python benchmarks/suite.py --sizes small --baseline benchmarks/baselines/small.json
+
+Sizes are presets or explicit shapes written CATxSUBxSVCxVAR, i.e.
+categories x subcategories per category x services per subcategory x
+variants per service. With --baseline, any p95 more than --tolerance
+(and at least --min-delta ms) slower than the baseline is reported and the
+exit status is 1.
+
+benchmarks/baselines/small.json is the committed baseline for the small
+preset, saved with --iterations 200. Check a change for regressions with
+
+    python benchmarks/suite.py --sizes small --iterations 200 --baseline benchmarks/baselines/small.json
+
+Timings depend on the host, so on another machine first save a baseline
+of the unchanged tree there (--save-baseline) and compare against that.
+On busy or shared hosts the HTTP load scenarios vary by about a third
+between runs; rerun, or raise --tolerance, before reading a single
+flagged scenario as a regression.
+"""
+import argparse
+import http.client
+import json
+import os
+import resource
+import socketserver
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRESETS = {
+    "small": (4, 5, 10, 3),       # 600 variants
+    "medium": (10, 10, 20, 3),    # 6,000 variants
+    "large": (20, 10, 50, 4),     # 40,000 variants
+}
+CART_SIZES = (1, 10, 50)
+
+
+def parse_shape(size):
+    if size in PRESETS:
+        return PRESETS[size]
+    return tuple(int(part) for part in size.split("x"))
+
+
+def stats(samples, elapsed=None):
+    ms = sorted(sample * 1000 for sample in samples)
+
+    def pct(p):
+        return round(ms[min(len(ms) - 1, int(len(ms) * p / 100))], 3)
+
+    return {
+        "count": len(ms),
+        "p50_ms": round(statistics.median(ms), 3),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "throughput_rps": round(len(ms) / (elapsed if elapsed else sum(samples)), 1),
+    }
+
+
+def measure(fn, iterations, warmup=2):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return stats(samples)
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+# Seeding
+
+def seed_catalog(shop, shape):
+    categories, subcategories, services, variants = shape
+    db = shop.db
+    with shop.app.app_context():
+        shop.init_db()
+        for model in (shop.Variant, shop.Service, shop.Subcategory, shop.Category):
+            db.session.execute(db.delete(model))
+
+        category_rows, subcategory_rows, service_rows, variant_rows = [], [], [], []
+        for c in range(1, categories + 1):
+            category_rows.append({"id": c, "name": f"Category {c}", "image_filename": None})
+            for _ in range(subcategories):
+                sub_id = len(subcategory_rows) + 1
+                subcategory_rows.append({"id": sub_id, "name": f"Subcategory {sub_id}", "category_id": c})
+                for _ in range(services):
+                    service_id = len(service_rows) + 1
+                    service_rows.append({
+                        "id": service_id,
+                        "name": f"Service {service_id} paneer veg thali",
+                        "available": True,
+                        "description": "Synthetic benchmark service with a short description",
+                        "subcategory_id": sub_id,
+                        "image_filename": None,
+                    })
+                    for v in range(variants):
+                        variant_rows.append({
+                            "id": len(variant_rows) + 1,
+                            "name": f"Variant {v}",
+                            "price": 50 + v * 10,
+                            "unit": "per plate",
+                            "service_id": service_id,
+                            "available": True,
+                        })
+
+        for model, rows in ((shop.Category, category_rows), (shop.Subcategory, subcategory_rows),
+                            (shop.Service, service_rows), (shop.Variant, variant_rows)):
+            db.session.execute(db.insert(model), rows)
+        db.session.execute(db.update(shop.CatalogVersion).values(version=shop.CatalogVersion.version + 1))
+        db.session.commit()
+    return [(row["service_id"], row["id"]) for row in variant_rows]
+
+
+def order_form(cart):
+    form = {"name": "Bench", "phone": "9999999999", "address": "Benchmark Road", "payment_mode": "UPI"}
+    for service_id, variant_id in cart:
+        form[f"service_{service_id}_{variant_id}"] = "2"
+    return form
+
+
+def quote_body(cart):
+    return json.dumps({"items": [
+        {"service_id": service_id, "variant_id": variant_id, "quantity": 2} for service_id, variant_id in cart
+    ]})
+
+
+# In-process scenarios
+
+def run_in_process(shop, keys, iterations):
+    results = {}
+    client = shop.app.test_client()
+    with client.session_transaction() as sess:
+        sess["logged_in"] = True
+
+    with shop.app.app_context():
+        results["load_services_data"] = measure(shop.load_services_data, iterations)
+        results["refresh_catalog"] = measure(shop.refresh_catalog, iterations)
+        results["get_services_data_cached"] = measure(shop.get_services_data, iterations * 10)
+
+    def uncached(path):
+        def fn():
+            shop._page_cache.clear()
+            client.get(path)
+        return fn
+
+    results["index_uncached"] = measure(uncached("/"), iterations)
+    results["index_cached"] = measure(lambda: client.get("/"), iterations * 10)
+    results["api_catalog_uncached"] = measure(uncached("/api/catalog"), iterations)
+    results["api_catalog_cached"] = measure(lambda: client.get("/api/catalog"), iterations * 10)
+
+    for size in CART_SIZES:
+        form = order_form(keys[:size])
+        results[f"submit_order_{size}"] = measure(lambda: client.post("/submit_order", data=form), iterations)
+
+    for size in CART_SIZES:
+        body = quote_body(keys[:size])
+        results[f"cart_quote_{size}"] = measure(
+            lambda: client.post("/api/cart/quote", data=body, content_type="application/json"), iterations * 10
+        )
+
+    results["admin_panel"] = measure(lambda: client.get("/admin/panel"), max(3, iterations // 5))
+    return results
+
+
+# Multi-process WSGI server
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def start_server(shop, workers):
+    # One listening socket, accepted on by several forked worker processes
+    server = make_server("127.0.0.1", 0, shop.app, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            # Never reuse the parent's pooled SQLite connections after fork
+            with shop.app.app_context():
+                shop.db.engine.dispose(close=False)
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    return server, pids
+
+
+def stop_server(server, pids):
+    for pid in pids:
+        os.kill(pid, 15)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    server.server_close()
+
+
+def load_test(port, method, path, body, seconds, concurrency, content_type="application/x-www-form-urlencoded"):
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+    headers = {"Content-Type": content_type} if body else {}
+
+    def worker():
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors[0] += 1
+            except OSError:
+                errors[0] += 1
+            finally:
+                conn.close()
+            local.append(time.perf_counter() - start)
+        with lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    result = stats(samples, time.perf_counter() - started)
+    result["errors"] = errors[0]
+    return result
+
+
+def run_server(shop, keys, workers, seconds, concurrency):
+    server, pids = start_server(shop, workers)
+    port = server.server_address[1]
+    try:
+        results = {
+            "http_index": load_test(port, "GET", "/", None, seconds, concurrency),
+            "http_api_catalog": load_test(port, "GET", "/api/catalog", None, seconds, concurrency),
+            "http_submit_order_10": load_test(
+                port, "POST", "/submit_order", urlencode(order_form(keys[:10])), seconds, concurrency
+            ),
+            "http_cart_quote_10": load_test(
+                port, "POST", "/api/cart/quote", quote_body(keys[:10]), seconds, concurrency, "application/json"
+            ),
+        }
+    finally:
+        stop_server(server, pids)
+    results["workers_peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return results
+
+
+def run_one(args):
+    sys.path.insert(0, ROOT)
+    import app as shop
+
+    shop.create_app()
+    shape = parse_shape(args.size)
+    keys = seed_catalog(shop, shape)
+    result = {"shape": list(shape), "variants": len(keys)}
+    result["scenarios"] = run_in_process(shop, keys, args.iterations)
+    result["peak_rss_mb"] = peak_rss_mb()
+    if args.workers:
+        result["scenarios"].update(run_server(shop, keys, args.workers, args.seconds, args.concurrency))
+    json.dump(result, sys.stdout)
+
+
+# Reporting
+
+def compare(results, baseline, tolerance, min_delta):
+    regressions = []
+    for size, result in results.items():
+        for name, current in result["scenarios"].items():
+            previous = baseline.get(size, {}).get("scenarios", {}).get(name)
+            if not isinstance(current, dict) or not previous:
+                continue
+            # Timer noise on sub-millisecond scenarios is not a regression
+            if current["p95_ms"] > max(previous["p95_ms"] * (1 + tolerance), previous["p95_ms"] + min_delta):
+                regressions.append(f"{size}/{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+    return regressions
+
+
+def print_report(results):
+    for size, result in results.items():
+        print(f"\n== {size} {result['shape']} ({result['variants']} variants), peak RSS {result['peak_rss_mb']} MB")
+        for name, row in result["scenarios"].items():
+            if not isinstance(row, dict):
+                print(f"  {name:<28} {row}")
+                continue
+            print(f"  {name:<28} p50={row['p50_ms']:>9.3f}ms p95={row['p95_ms']:>9.3f}ms "
+                  f"p99={row['p99_ms']:>9.3f}ms {row['throughput_rps']:>9.1f} rps"
+                  + (f" errors={row['errors']}" if row.get("errors") else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="small,medium")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=2, help="WSGI worker processes (0 to skip HTTP tests)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="compare against a saved JSON baseline")
+    parser.add_argument("--save-baseline", help="write the results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta", type=float, default=1.0, help="smallest p95 increase (ms) reported")
+    parser.add_argument("--run-one", dest="size", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size:
+        run_one(args)
+        return
+
+    results = {}
+    for size in args.sizes.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tmp, "bench.db"),
+                       ORDER_FLUSH_INTERVAL="0.5")
+            out = subprocess.run(
+                [sys.executable, __file__, "--run-one", size, "--iterations", str(args.iterations),
+                 "--workers", str(args.workers), "--concurrency", str(args.concurrency),
+                 "--seconds", str(args.seconds)],
+                env=env, check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+            results[size] = json.loads(out)
+
+    print_report(results)
+    for path in filter(None, (args.output, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
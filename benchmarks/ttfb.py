@@ -0,0 +1,100 @@
+"""Time to first byte of uncached pages, streamed and rendered whole.
+
+For each catalog size a fresh interpreter seeds a throwaway database,
+serves the app from a local threaded WSGI server and requests GET / and
+GET /api/catalog with an empty page cache, once with STREAM_PAGES on and
+once off. It reports the time to the first body byte and to the last.
+
+    python benchmarks/ttfb.py --variants 10000,100000 --runs 5
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ("/", "/api/catalog")
+
+
+def shape_for(variants):
+    # 10 categories x 10 subcategories, 4 variants per service
+    return (10, 10, max(1, variants // 400), 4)
+
+
+def fetch(port, path):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    conn.request("GET", path)
+    response = conn.getresponse()
+    response.read(1)
+    first = time.perf_counter() - start
+    size = 1 + len(response.read())
+    total = time.perf_counter() - start
+    conn.close()
+    return first, total, size
+
+
+def run_one(variants, runs):
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    sys.path.insert(0, ROOT)
+    import app as shop
+    import suite
+    from wsgiref.simple_server import make_server
+
+    shop.create_app()
+    suite.seed_catalog(shop, shape_for(variants))
+    with shop.app.app_context():
+        shop.refresh_catalog()
+    server = make_server("127.0.0.1", 0, shop.app,
+                         server_class=suite.ThreadingWSGIServer, handler_class=suite.QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    results = {}
+    for stream in (False, True):
+        shop.app.config['STREAM_PAGES'] = stream
+        for path in PATHS:
+            samples = []
+            for _ in range(runs + 1):
+                shop._page_cache.clear()
+                samples.append(fetch(server.server_address[1], path))
+            samples = samples[1:]
+            results[f"{path} {'streamed' if stream else 'whole'}"] = {
+                "first_byte": statistics.median(sample[0] for sample in samples),
+                "total": statistics.median(sample[1] for sample in samples),
+                "bytes": samples[0][2],
+            }
+    server.shutdown()
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--variants", default="10000,100000")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size:
+        run_one(args.size, args.runs)
+        return
+
+    for variants in map(int, args.variants.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tmp, "bench.db"))
+            out = subprocess.run(
+                [sys.executable, __file__, "--size", str(variants), "--runs", str(args.runs)],
+                env=env, check=True, stdout=subprocess.PIPE, text=True,
+            ).stdout
+        for name, result in json.loads(out.splitlines()[-1]).items():
+            print(f"{variants:>7} variants GET {name:<22} first byte {result['first_byte'] * 1000:8.1f} ms, "
+                  f"last byte {result['total'] * 1000:8.1f} ms ({result['bytes']:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
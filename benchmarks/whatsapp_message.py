@@ -0,0 +1,134 @@
+"""WhatsApp order message building for large carts.
+
+Times building the wa.me link for carts of several sizes two ways: the
+previous approach (format every line, join, then percent-encode the whole
+message) and OrderMessageRenderer with lines precompiled per variant, as
+submit_order() uses it. Also reports the cost of importing requests, which
+the previous approach loaded only for its quote().
+
+    python benchmarks/whatsapp_message.py --carts 10,100,1000
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_message import OrderMessageRenderer  # noqa: E402
+
+ORDER = {
+    "date": "01-01-2025 01:30 PM",
+    "name": "Benchmark Customer",
+    "phone": "9999999999",
+    "address": "Benchmark Road, Ranchi",
+    "payment_mode": "UPI",
+}
+
+
+def synthetic_items(count, renderer):
+    # Cart lines spread over 10 categories, as priced from the price index
+    items = []
+    for n in range(count):
+        entry = {
+            "name": f"Service {n} paneer veg thali",
+            "variant": f"Variant {n % 3}",
+            "unit": "per plate",
+            "price": 50 + n % 7 * 10,
+            "category": f"Category {n % 10}",
+            "subcategory": f"Subcategory {n % 30}",
+        }
+        entry["message_category"] = renderer.compile_category(entry["category"])
+        entry["message_line"] = renderer.compile_item(entry)
+        quantity = n % 4 + 1
+        items.append((entry, quantity, quantity * entry["price"]))
+    return items
+
+
+def legacy_url(order, items):
+    message_parts = [
+        "📌 * Ranchi Mess.Com* 📌",
+        f"📅 *Date*: {order['date']}",
+        "",
+        "👤 *Customer Details*:",
+        f"• *Name*: {order['name']}",
+        f"• *Phone*: {order['phone']}",
+        f"• *Address*: {order['address']}",
+        "",
+        "🛒 *Ordered Items*:"
+    ]
+    categories = {}
+    for entry, quantity, subtotal in items:
+        categories.setdefault(entry['category'], []).append((entry, quantity, subtotal))
+    for category_name, lines in categories.items():
+        message_parts.append(f"\n*{category_name}*")
+        for entry, quantity, subtotal in lines:
+            message_parts.append(
+                f"➡️ {entry['name']} ({entry['variant']}) - "
+                f"Qty: {quantity} {entry['unit']} × ₹{entry['price']} = ₹{subtotal}"
+            )
+            message_parts.append("")
+        message_parts.append("")
+    message_parts.extend([
+        "",
+        "💵 *Payment Summary*:",
+        f"• *Subtotal*: ₹{order['subtotal']}",
+        f"• *Total Amount*: ₹{order['total']}",
+        f"• *Payment Mode*: {order['payment_mode']}",
+        "",
+        "🛑 *Please Share Your current location link for fast delivery* 🛑",
+    ])
+    return "https://wa.me/+918709625288?text=" + quote("\n".join(message_parts))
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def import_time(module):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    try:
+        out = subprocess.run([sys.executable, "-c", code], check=True, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, text=True).stdout
+    except subprocess.CalledProcessError:
+        return None
+    return float(out) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--carts", default="1,10,100,1000")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--max-url-length", type=int, default=8000)
+    args = parser.parse_args()
+
+    renderer = OrderMessageRenderer(phone="+918709625288", max_url_length=10 ** 9)
+    limited = OrderMessageRenderer(phone="+918709625288", max_url_length=args.max_url_length)
+    for size in map(int, args.carts.split(",")):
+        items = synthetic_items(size, renderer)
+        order = dict(ORDER, subtotal=sum(item[2] for item in items))
+        order["total"] = order["subtotal"]
+        if renderer.render_url(order, items) != legacy_url(order, items):
+            sys.exit("Rendered message differs from the previous format")
+        legacy = measure(lambda: legacy_url(order, items), args.iterations)
+        compiled = measure(lambda: renderer.render_url(order, items), args.iterations)
+        truncated = limited.render_url(order, items)
+        print(f"cart {size:>5}: previous {legacy:9.1f}us  compiled {compiled:9.1f}us  "
+              f"({legacy / compiled:4.1f}x)  url {len(legacy_url(order, items)):>7} chars, "
+              f"{len(truncated)} with --max-url-length")
+
+    for module in ("requests", "urllib.parse"):
+        ms = import_time(module)
+        print(f"import {module:<13} " + (f"{ms:7.1f}ms" if ms is not None else "not installed"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,643 @@
+import sys
+from array import array
+from bisect import bisect_left
+from operator import itemgetter
+
+# Compact read-only catalog snapshot. Each entity kind is a table of columns
+# (array/bytearray for numbers and flags, lists of interned strings for
+# text) with rows in catalog order, so the children of a row are one
+# contiguous range. Rows link to their parent and first child by integer
+# offset. Row objects are small views created on access; they support both
+# attribute access (templates) and item access (code written against the
+# nested dicts), and to_dict() rebuilds the old plain-dict shape.
+
+KINDS = ("categories", "subcategories", "services", "variants")
+PARENT_KEYS = {"subcategories": "category_id", "services": "subcategory_id", "variants": "service_id"}
+# Fields of the rows Catalog.build() takes, per kind
+BUILD_FIELDS = {
+    "categories": ("id", "name", "image_filename", "image_widths", "image_version"),
+    "subcategories": ("category_id", "id", "name"),
+    "services": ("subcategory_id", "id", "name", "available", "description", "image_filename", "image_widths", "image_version"),
+    "variants": ("service_id", "id", "name", "price", "unit", "available"),
+}
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _stored(column, field, value):
+    # value as build() stores it in column
+    if type(column) is bytearray:
+        return 1 if value else 0
+    if field == "image_widths":
+        return tuple(_intern(item) for item in value or ())
+    if type(column) is array:
+        return int(value)
+    return _intern(value)
+
+
+class _Table:
+    __slots__ = ("columns", "parent", "first", "_ids", "_offsets")
+
+    def __init__(self, ints=(), flags=(), values=()):
+        self.columns = {"id": array("q")}
+        for name in ints:
+            self.columns[name] = array("q")
+        for name in flags:
+            self.columns[name] = bytearray()
+        for name in values:
+            self.columns[name] = []
+        self.parent = array("l")   # offset of the parent row
+        self.first = array("l")    # offset of the first child row, plus an end marker
+        self._ids = array("q")     # ids sorted, for lookups
+        self._offsets = array("l")
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    def index(self):
+        ids = self.columns["id"]
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        self._ids = array("q", (ids[offset] for offset in order))
+        self._offsets = array("l", order)
+
+    def find(self, row_id):
+        position = bisect_left(self._ids, row_id)
+        if position < len(self._ids) and self._ids[position] == row_id:
+            return self._offsets[position]
+        return None
+
+    def copy(self):
+        # Same rows and links (shared, they are never changed); the columns
+        # are copies that can be written to
+        table = _Table.__new__(_Table)
+        table.columns = {name: column[:] for name, column in self.columns.items()}
+        table.parent = self.parent
+        table.first = self.first
+        table._ids = self._ids
+        table._offsets = self._offsets
+        return table
+
+
+def _field(name):
+    def get(self):
+        return self._catalog._tables[self._kind].columns[name][self._offset]
+    return property(get)
+
+
+def _flag(name):
+    def get(self):
+        return bool(self._catalog._tables[self._kind].columns[name][self._offset])
+    return property(get)
+
+
+def _children(cls):
+    def get(self):
+        first = self._catalog._tables[self._kind].first
+        return tuple(cls(self._catalog, offset) for offset in range(first[self._offset], first[self._offset + 1]))
+    return property(get)
+
+
+def _parent(cls):
+    def get(self):
+        return cls(self._catalog, self._catalog._tables[self._kind].parent[self._offset])
+    return property(get)
+
+
+class _Row:
+    __slots__ = ("_catalog", "_offset")
+    _kind = None
+    _fields = ()
+    _children_key = None
+
+    def __init__(self, catalog, offset):
+        self._catalog = catalog
+        self._offset = offset
+
+    def __getitem__(self, key):
+        if not key.startswith("_"):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._catalog is self._catalog and other._offset == self._offset
+
+    def __hash__(self):
+        return hash((self._kind, self._offset))
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id} {self.name!r}>"
+
+    def to_dict(self):
+        row = {field: getattr(self, field) for field in self._fields}
+        if self._children_key:
+            row[self._children_key] = [child.to_dict() for child in getattr(self, self._children_key)]
+        return row
+
+
+class Category(_Row):
+    __slots__ = ()
+    _kind = "categories"
+    _fields = ("id", "name", "image_filename", "image_widths", "image_version")
+    _children_key = "subcategories"
+    id = _field("id")
+    name = _field("name")
+    image_filename = _field("image_filename")
+    image_widths = _field("image_widths")
+    image_version = _field("image_version")
+    message_category = _field("message_category")
+
+
+class Subcategory(_Row):
+    __slots__ = ()
+    _kind = "subcategories"
+    _fields = ("id", "name")
+    _children_key = "services"
+    id = _field("id")
+    name = _field("name")
+    category = _parent(Category)
+
+    @property
+    def category_id(self):
+        return self.category.id
+
+
+class Service(_Row):
+    __slots__ = ()
+    _kind = "services"
+    _fields = ("id", "name", "available", "description", "image_filename", "image_widths", "image_version")
+    _children_key = "variants"
+    id = _field("id")
+    name = _field("name")
+    available = _flag("available")
+    description = _field("description")
+    image_filename = _field("image_filename")
+    image_widths = _field("image_widths")
+    image_version = _field("image_version")
+    subcategory = _parent(Subcategory)
+
+    @property
+    def subcategory_id(self):
+        return self.subcategory.id
+
+
+class Variant(_Row):
+    __slots__ = ()
+    _kind = "variants"
+    _fields = ("id", "name", "price", "unit", "available")
+    id = _field("id")
+    name = _field("name")
+    price = _field("price")
+    unit = _field("unit")
+    available = _flag("available")
+    message_line = _field("message_line")
+    service = _parent(Service)
+
+    @property
+    def service_id(self):
+        return self.service.id
+
+    @property
+    def message_category(self):
+        return self.service.subcategory.category.message_category
+
+
+Category.subcategories = _children(Subcategory)
+Subcategory.services = _children(Service)
+Service.variants = _children(Variant)
+
+ROW_CLASSES = {"categories": Category, "subcategories": Subcategory, "services": Service, "variants": Variant}
+
+
+def _fill(table, parent_table, rows, parent_offsets):
+    # rows are (parent id, id, ...); rows whose parent is missing are
+    # dropped. Returns the id -> offset map of the rows kept.
+    if parent_offsets is None:
+        rows = sorted(rows, key=lambda row: row[1])
+    else:
+        rows = sorted(
+            (row for row in rows if row[0] in parent_offsets),
+            key=lambda row: (parent_offsets[row[0]], row[1])
+        )
+    offsets = {}
+    for row in rows:
+        offsets[row[1]] = len(offsets)
+        if parent_offsets is not None:
+            table.parent.append(parent_offsets[row[0]])
+    if parent_table is not None:
+        # Children of each parent are contiguous, so first[p]..first[p + 1]
+        first = parent_table.first
+        position = 0
+        for parent in range(len(parent_table)):
+            first.append(position)
+            while position < len(rows) and table.parent[position] == parent:
+                position += 1
+        first.append(position)
+    return rows, offsets
+
+
+class Catalog:
+    __slots__ = ("_tables",)
+
+    def __init__(self):
+        self._tables = {
+            "categories": _Table(values=("name", "image_filename", "image_widths", "image_version", "message_category")),
+            "subcategories": _Table(values=("name",)),
+            "services": _Table(flags=("available",), values=("name", "description", "image_filename", "image_widths", "image_version")),
+            "variants": _Table(ints=("price",), flags=("available",), values=("name", "unit", "message_line")),
+        }
+
+    @classmethod
+    def build(cls, categories, subcategories, services, variants, compile_category=None, compile_item=None):
+        # categories: (id, name, image_filename, image_widths, image_version)
+        # subcategories: (category_id, id, name)
+        # services: (subcategory_id, id, name, available, description,
+        #            image_filename, image_widths, image_version)
+        # variants: (service_id, id, name, price, unit, available)
+        # compile_category(name) and compile_item(line details) precompute the
+        # order message pieces stored with each category and variant.
+        catalog = cls()
+        tables = catalog._tables
+        shared = {}
+
+        def share(value):
+            # Equal tuples (image widths, message pieces) are stored once
+            if type(value) is tuple:
+                value = tuple(_intern(item) for item in value)
+                return shared.setdefault(value, value)
+            return _intern(value)
+
+        table = tables["categories"]
+        rows, category_offsets = _fill(table, None, ((None,) + tuple(row) for row in categories), None)
+        columns = table.columns
+        for _, row_id, name, image_filename, widths, version in rows:
+            columns["id"].append(row_id)
+            columns["name"].append(_intern(name))
+            columns["image_filename"].append(_intern(image_filename))
+            columns["image_widths"].append(share(tuple(widths or ())))
+            columns["image_version"].append(_intern(version))
+            columns["message_category"].append(_intern(compile_category(name)) if compile_category else None)
+
+        table = tables["subcategories"]
+        rows, subcategory_offsets = _fill(table, tables["categories"], subcategories, category_offsets)
+        columns = table.columns
+        for _, row_id, name in rows:
+            columns["id"].append(row_id)
+            columns["name"].append(_intern(name))
+
+        table = tables["services"]
+        rows, service_offsets = _fill(table, tables["subcategories"], services, subcategory_offsets)
+        columns = table.columns
+        for _, row_id, name, available, description, image_filename, widths, version in rows:
+            columns["id"].append(row_id)
+            columns["name"].append(_intern(name))
+            columns["available"].append(1 if available else 0)
+            columns["description"].append(_intern(description))
+            columns["image_filename"].append(_intern(image_filename))
+            columns["image_widths"].append(share(tuple(widths or ())))
+            columns["image_version"].append(_intern(version))
+
+        table = tables["variants"]
+        rows, _ = _fill(table, tables["services"], variants, service_offsets)
+        columns = table.columns
+        for _, row_id, name, price, unit, available in rows:
+            columns["id"].append(row_id)
+            columns["name"].append(_intern(name))
+            columns["price"].append(int(price))
+            columns["unit"].append(_intern(unit))
+            columns["available"].append(1 if available else 0)
+            line = None
+            if compile_item:
+                line = share(compile_item(catalog._item_details(len(columns["id"]) - 1)))
+            columns["message_line"].append(line)
+
+        for table in tables.values():
+            table.index()
+        return catalog
+
+    def _item_details(self, offset):
+        # The order line fields compile_item() takes for the variant at offset
+        tables = self._tables
+        variants = tables["variants"]
+        services = tables["services"]
+        subcategories = tables["subcategories"]
+        service = variants.parent[offset]
+        subcategory = services.parent[service]
+        category = subcategories.parent[subcategory]
+        return {
+            "name": services.columns["name"][service],
+            "variant": variants.columns["name"][offset],
+            "unit": variants.columns["unit"][offset],
+            "price": variants.columns["price"][offset],
+            "category": tables["categories"].columns["name"][category],
+            "subcategory": subcategories.columns["name"][subcategory],
+        }
+
+    def patch(self, changes, compile_category=None, compile_item=None):
+        # A new catalog with changes applied. changes maps kind to
+        # {id: row as build() takes it, or None to remove the row and
+        # everything under it}. If every change rewrites an existing row
+        # under the same parent, only the columns of the kinds changed are
+        # copied and written to; otherwise the tables are spliced from this
+        # catalog's rows. Message pieces are compiled again only under rows
+        # changed.
+        changes = {kind: rows for kind, rows in changes.items() if rows}
+        if all(self._in_place(kind, rows) for kind, rows in changes.items()):
+            return self._updated(changes, compile_category, compile_item)
+        return self._spliced(changes, compile_category, compile_item)
+
+    def _in_place(self, kind, rows):
+        table = self._tables[kind]
+        parent_key = PARENT_KEYS.get(kind)
+        parent_ids = self._tables[KINDS[KINDS.index(kind) - 1]].columns["id"] if parent_key else None
+        for row_id, row in rows.items():
+            offset = None if row is None else table.find(row_id)
+            if offset is None or (parent_key and parent_ids[table.parent[offset]] != row[0]):
+                return False
+        return True
+
+    def _descendants(self, kind, first, last):
+        # Offset ranges of the rows under rows first..last - 1, per kind
+        ranges = {}
+        for child in KINDS[KINDS.index(kind) + 1:]:
+            links = self._tables[kind].first
+            first, last = links[first], links[last]
+            ranges[child] = (first, last)
+            kind = child
+        return ranges
+
+    def _updated(self, changes, compile_category, compile_item):
+        catalog = Catalog.__new__(Catalog)
+        catalog._tables = dict(self._tables)
+        lines = []
+        for kind, rows in changes.items():
+            table = catalog._tables[kind] = self._tables[kind].copy()
+            columns = table.columns
+            for row_id, row in rows.items():
+                offset = table.find(row_id)
+                for field, value in zip(BUILD_FIELDS[kind], row):
+                    column = columns.get(field)
+                    if column is not None and field != "id":
+                        column[offset] = _stored(column, field, value)
+                if kind == "categories" and compile_category:
+                    columns["message_category"][offset] = _intern(compile_category(columns["name"][offset]))
+                if kind == "variants":
+                    lines.append((offset, offset + 1))
+                else:
+                    lines.append(self._descendants(kind, offset, offset + 1)["variants"])
+        if compile_item and lines:
+            if "variants" not in changes:
+                catalog._tables["variants"] = self._tables["variants"].copy()
+            column = catalog._tables["variants"].columns["message_line"]
+            for first, last in lines:
+                for offset in range(first, last):
+                    column[offset] = compile_item(catalog._item_details(offset))
+        return catalog
+
+    def _spliced(self, changes, compile_category, compile_item):
+        # Kind by kind, the rows kept (in their order, parents remapped) are
+        # merged with the rows added or rewritten, so only those are
+        # converted; build() would sort and convert every row again.
+        catalog = Catalog()
+        remap = None   # old offset -> new offset of the parent kind, -1 if gone
+        fresh = None   # per new offset of the parent kind: changed or under a changed row
+        for kind in KINDS:
+            old, table = self._tables[kind], catalog._tables[kind]
+            rows = changes.get(kind, {})
+            parent_key = PARENT_KEYS.get(kind)
+            parent_table = catalog._tables[KINDS[KINDS.index(kind) - 1]] if parent_key else None
+
+            kept = []
+            for offset, row_id in enumerate(old.columns["id"]):
+                if row_id not in rows:
+                    parent = remap[old.parent[offset]] if parent_key else 0
+                    if parent >= 0:
+                        kept.append(((parent, row_id), offset))
+            added = []
+            for row_id, row in rows.items():
+                parent = None if row is None else parent_table.find(row[0]) if parent_key else 0
+                if parent is not None:
+                    added.append(((parent, row_id), row))
+            # Kept rows are in order already unless a parent moved
+            sources = sorted(kept + added, key=itemgetter(0))
+
+            fields = BUILD_FIELDS[kind]
+            for name, column in table.columns.items():
+                old_column = old.columns[name]
+                if name in fields:
+                    index = fields.index(name)
+                    column.extend([
+                        old_column[source] if type(source) is int else _stored(old_column, name, source[index])
+                        for _, source in sources
+                    ])
+                else:
+                    # Message pieces: kept as they are, compiled below where needed
+                    column.extend([old_column[source] if type(source) is int else None for _, source in sources])
+            if parent_key:
+                table.parent.extend([key[0] for key, _ in sources])
+                parent_table.first.extend([bisect_left(table.parent, parent) for parent in range(len(parent_table) + 1)])
+
+            parent_fresh, fresh = fresh, bytearray(len(sources))
+            remap = array("l", [-1]) * len(old)
+            for offset, (key, source) in enumerate(sources):
+                if type(source) is int:
+                    remap[source] = offset
+                    if parent_fresh is not None and parent_fresh[key[0]]:
+                        fresh[offset] = 1
+                else:
+                    fresh[offset] = 1
+                    previous = old.find(key[1])
+                    if previous is not None:
+                        remap[previous] = offset
+            table.index()
+
+            if kind == "categories" and compile_category:
+                column = table.columns["message_category"]
+                for offset, (_, source) in enumerate(sources):
+                    if type(source) is not int:
+                        column[offset] = _intern(compile_category(source[1]))
+
+        if compile_item:
+            column = catalog._tables["variants"].columns["message_line"]
+            for offset, flag in enumerate(fresh):
+                if flag:
+                    column[offset] = compile_item(catalog._item_details(offset))
+        return catalog
+
+    @property
+    def categories(self):
+        return tuple(Category(self, offset) for offset in range(len(self._tables["categories"])))
+
+    def __getitem__(self, key):
+        # services_data["categories"], as with the nested dicts
+        if key == "categories":
+            return self.categories
+        raise KeyError(key)
+
+    def counts(self):
+        return {kind: len(table) for kind, table in self._tables.items()}
+
+    def _lookup(self, kind, row_id):
+        offset = self._tables[kind].find(row_id)
+        return None if offset is None else ROW_CLASSES[kind](self, offset)
+
+    def category(self, category_id):
+        return self._lookup("categories", category_id)
+
+    def subcategory(self, subcategory_id):
+        return self._lookup("subcategories", subcategory_id)
+
+    def service(self, service_id):
+        return self._lookup("services", service_id)
+
+    def variant(self, variant_id):
+        return self._lookup("variants", variant_id)
+
+    def order_line(self, service_id, variant_id):
+        # The variant a cart key refers to, or None if it is not on that service
+        variant = self.variant(variant_id)
+        if variant is None or variant.service_id != service_id:
+            return None
+        return variant
+
+    def to_dict(self):
+        return {"categories": [category.to_dict() for category in self.categories]}
+
+    def contains(self, kind, row_id):
+        return self._tables[kind].find(row_id) is not None
+
+    def subtree(self, kind, row_id):
+        # Ids of a row and of every row under it, per kind
+        offset = self._tables[kind].find(row_id)
+        if offset is None:
+            return {}
+        ids = {kind: [row_id]}
+        for child, (first, last) in self._descendants(kind, offset, offset + 1).items():
+            ids[child] = self._tables[child].columns["id"][first:last].tolist()
+        return ids
+
+    def entity(self, kind, row_id):
+        # One row as iter_entities() yields it, or None
+        row = self._lookup(kind, row_id)
+        if row is None:
+            return None
+        entity = {"id": row_id}
+        if kind in PARENT_KEYS:
+            entity[PARENT_KEYS[kind]] = row[PARENT_KEYS[kind]]
+        for field in row._fields[1:]:
+            value = getattr(row, field)
+            entity[field] = list(value) if field == "image_widths" else value
+        return entity
+
+    def service_entities(self, service_ids):
+        # entities() cut down to some services, their subcategories and
+        # their variants, for updating the search index
+        entities = {"subcategories": {}, "services": {}, "variants": {}}
+        for service_id in service_ids:
+            service = self.service(service_id)
+            if service is None:
+                continue
+            entities["services"][service_id] = self.entity("services", service_id)
+            subcategory_id = service.subcategory_id
+            entities["subcategories"][subcategory_id] = self.entity("subcategories", subcategory_id)
+            for variant in service.variants:
+                entities["variants"][variant.id] = self.entity("variants", variant.id)
+        return entities
+
+    def iter_entities(self, kind):
+        # (id, row) in catalog order, rows flat with a parent id instead of
+        # nesting, as served by /api/catalog and fed to the search index
+        table = self._tables[kind]
+        parent_key = PARENT_KEYS.get(kind)
+        parent_ids = self._tables[KINDS[KINDS.index(kind) - 1]].columns["id"] if parent_key else None
+        fields = ROW_CLASSES[kind]._fields[1:]
+        columns = [table.columns[field] for field in fields]
+        flags = [type(column) is bytearray for column in columns]
+        widths = [field == "image_widths" for field in fields]
+        for offset, row_id in enumerate(table.columns["id"]):
+            row = {"id": row_id}
+            if parent_key:
+                row[parent_key] = parent_ids[table.parent[offset]]
+            for field, column, flag, width in zip(fields, columns, flags, widths):
+                value = column[offset]
+                row[field] = bool(value) if flag else list(value) if width else value
+            yield row_id, row
+
+    def entities(self):
+        return {kind: dict(self.iter_entities(kind)) for kind in KINDS}
+
+
+def row_hash(row):
+    return hash(tuple(tuple(value) if type(value) is list else value for value in row.values()))
+
+
+# Changes per kind above which CatalogDigest.updated() rebuilds the arrays
+DIGEST_EDITS_MAX = 64
+
+
+# Per kind, the sorted row ids of one catalog version and a hash of each row.
+# Kept for recent versions so /api/catalog?since= can send only the rows that
+# changed without keeping old catalogs around.
+class CatalogDigest:
+    __slots__ = ("_kinds",)
+
+    def __init__(self, entities):
+        self._kinds = {}
+        for kind, rows in entities.items():
+            self._kinds[kind] = self._arrays((row_id, row_hash(row)) for row_id, row in rows.items())
+
+    @staticmethod
+    def _arrays(pairs):
+        pairs = sorted(pairs)
+        return array("q", (pair[0] for pair in pairs)), array("q", (pair[1] for pair in pairs))
+
+    def updated(self, hashes):
+        # A copy with some rows changed: hashes maps kind to {id: row hash,
+        # or None for a removed row}
+        digest = CatalogDigest({})
+        digest._kinds = dict(self._kinds)
+        for kind, changes in hashes.items():
+            if not changes:
+                continue
+            ids, values = self._kinds[kind]
+            if len(changes) > DIGEST_EDITS_MAX:
+                rows = dict(zip(ids, values))
+                rows.update(changes)
+                digest._kinds[kind] = self._arrays((row_id, value) for row_id, value in rows.items() if value is not None)
+                continue
+            # A few rows: edit copies of the sorted arrays
+            ids, values = ids[:], values[:]
+            for row_id, value in changes.items():
+                position = bisect_left(ids, row_id)
+                found = position < len(ids) and ids[position] == row_id
+                if value is None:
+                    if found:
+                        del ids[position]
+                        del values[position]
+                elif found:
+                    values[position] = value
+                else:
+                    ids.insert(position, row_id)
+                    values.insert(position, value)
+            digest._kinds[kind] = (ids, values)
+        return digest
+
+    def ids(self, kind):
+        return self._kinds[kind][0]
+
+    def row_hash(self, kind, row_id):
+        ids, hashes = self._kinds[kind]
+        position = bisect_left(ids, row_id)
+        if position < len(ids) and ids[position] == row_id:
+            return hashes[position]
+        return None
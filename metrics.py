@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if isinstance(value, float) and value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # Bounds are inclusive ("le"), so a value equal to a bound lands in it
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# In-process metric registry rendered in the Prometheus text exposition format.
+# Every metric is declared once with describe(); samples are keyed by a tuple
+# of (label, value) pairs. Values are per process, so each worker reports its
+# own series.
+class Metrics:
+    def __init__(self, prefix=""):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._meta = {}      # name -> (type, help, buckets)
+        self._samples = {}   # name -> {labels: number or Histogram}
+
+    def describe(self, name, kind, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = (kind, help_text, buckets)
+        self._samples.setdefault(name, {})
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            samples = self._samples[name]
+            samples[labels] = samples.get(labels, 0) + value
+
+    def set(self, name, labels=(), value=0):
+        with self._lock:
+            self._samples[name][labels] = value
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            samples = self._samples[name]
+            histogram = samples.get(labels)
+            if histogram is None:
+                histogram = samples[labels] = Histogram(self._meta[name][2])
+            histogram.observe(value)
+
+    def values(self, name):
+        with self._lock:
+            return dict(self._samples[name])
+
+    def reset(self):
+        with self._lock:
+            for samples in self._samples.values():
+                samples.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self._meta.items():
+                full_name = self.prefix + name
+                lines.append(f"# HELP {full_name} {help_text}")
+                lines.append(f"# TYPE {full_name} {kind}")
+                for labels, sample in sorted(self._samples[name].items()):
+                    if kind != "histogram":
+                        lines.append(f"{full_name}{_format_labels(labels)} {_format_value(sample)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets + (float("inf"),), sample.counts):
+                        cumulative += count
+                        le = (("le", _format_value(float(bound))),)
+                        lines.append(f"{full_name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {_format_value(sample.sum)}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {sample.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    # ';' separates frames in the folded format
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name.replace(";", ":")
+
+
+# Statistical profiler for request threads. A single background thread takes
+# a stack sample of every thread between start() and finish() each interval;
+# the stacks of the slowest requests are kept and dumped in the folded
+# "frame;frame;frame count" format read by flamegraph.pl and speedscope.
+class SamplingProfiler:
+    def __init__(self, interval=0.005, keep=20):
+        self.interval = interval
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._active = {}        # thread id -> Counter of folded stacks
+        self._slowest = []       # min-heap of (duration, seq, label, stacks)
+        self._seq = itertools.count()
+        self._sampler_pid = None
+
+    def start(self):
+        self._ensure_sampler()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def finish(self, label, duration):
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+            if not stacks:
+                return
+            entry = (duration, next(self._seq), label, stacks)
+            if len(self._slowest) < self.keep:
+                heapq.heappush(self._slowest, entry)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def dump(self):
+        # Each request becomes its own root frame so the graphs do not merge
+        with self._lock:
+            slowest = sorted(self._slowest, reverse=True)
+        lines = []
+        for duration, _, label, stacks in slowest:
+            root = f"{label} {duration * 1000:.1f}ms".replace(";", ":")
+            for stack, count in stacks.items():
+                lines.append(f"{root};{stack} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def reset(self):
+        with self._lock:
+            self._slowest.clear()
+
+    def _ensure_sampler(self):
+        # Threads do not survive a fork, so each worker process starts its own sampler
+        if self._sampler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sampler_pid != os.getpid():
+                threading.Thread(target=self._run, name="stack-sampler", daemon=True).start()
+                self._sampler_pid = os.getpid()
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == own:
+                        continue
+                    names = []
+                    while frame is not None:
+                        names.append(_frame_name(frame))
+                        frame = frame.f_back
+                    stacks[";".join(reversed(names))] += 1
@@ -0,0 +1,204 @@
+import json
+from string import Formatter
+from urllib.parse import quote
+
+# Parts of the WhatsApp order message, each a str.format template with the
+# fields listed in TEMPLATE_FIELDS. The message is header, then per category
+# the category line, its item lines and category_end, then footer. When the
+# URL would be too long the remaining items are replaced by the more line.
+DEFAULT_TEMPLATE = {
+    "header": (
+        "📌 * Ranchi Mess.Com* 📌\n"
+        "📅 *Date*: {date}\n"
+        "\n"
+        "👤 *Customer Details*:\n"
+        "• *Name*: {name}\n"
+        "• *Phone*: {phone}\n"
+        "• *Address*: {address}\n"
+        "\n"
+        "🛒 *Ordered Items*:\n"
+    ),
+    "category": "\n*{category}*\n",
+    "item": "➡️ {name} ({variant}) - Qty: {quantity} {unit} × ₹{price} = ₹{subtotal}\n\n",
+    "category_end": "\n",
+    "more": "➕ *...and {count} more items*\n",
+    "footer": (
+        "\n"
+        "💵 *Payment Summary*:\n"
+        "• *Subtotal*: ₹{subtotal}\n"
+        "• *Total Amount*: ₹{total}\n"
+        "• *Payment Mode*: {payment_mode}\n"
+        "\n"
+        "🛑 *Please Share Your current location link for fast delivery* 🛑"
+    ),
+}
+
+ORDER_FIELDS = ("date", "name", "phone", "address", "subtotal", "total", "payment_mode")
+TEMPLATE_FIELDS = {
+    "header": ORDER_FIELDS,
+    "category": ("category",),
+    "item": ("name", "variant", "unit", "price", "category", "subcategory", "quantity", "subtotal"),
+    "category_end": (),
+    "more": ("count",),
+    "footer": ORDER_FIELDS,
+}
+# Item fields that change per order; the rest are fixed per variant
+LINE_FIELDS = ("quantity", "subtotal")
+
+_formatter = Formatter()
+
+
+def load_template(path=None):
+    # DEFAULT_TEMPLATE with the parts given in a JSON file replaced
+    template = dict(DEFAULT_TEMPLATE)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(DEFAULT_TEMPLATE)
+        if unknown:
+            raise ValueError(f"Unknown message template parts: {', '.join(sorted(unknown))}")
+        template.update(overrides)
+    return template
+
+
+def _parse(part, template):
+    # Literal strings and (field, conversion, spec) tuples, in order
+    tokens = []
+    for literal, field, spec, conversion in _formatter.parse(template):
+        if literal:
+            tokens.append(literal)
+        if field is None:
+            continue
+        if field not in TEMPLATE_FIELDS[part]:
+            raise ValueError(f"Unknown field {{{field}}} in the {part} message template")
+        tokens.append((field, conversion, spec or ""))
+    return tokens
+
+
+def _format(token, value):
+    _, conversion, spec = token
+    return format(_formatter.convert_field(value, conversion), spec)
+
+
+def _compile(tokens):
+    # Encoded literal text around the fields: len(fields) + 1 pieces
+    pieces, fields, current = [], [], []
+    for token in tokens:
+        if isinstance(token, str):
+            current.append(token)
+        else:
+            pieces.append(quote("".join(current)))
+            fields.append(token)
+            current = []
+    pieces.append(quote("".join(current)))
+    return tuple(pieces), tuple(fields)
+
+
+def _render(pieces, fields, values):
+    parts = [pieces[0]]
+    for field, piece in zip(fields, pieces[1:]):
+        text = _format(field, values[field[0]])
+        # Plain numbers need no escaping
+        parts.append(text if text.isascii() and text.isdigit() else quote(text))
+        parts.append(piece)
+    return "".join(parts)
+
+
+# Builds the wa.me link for an order. The literal text of every part is
+# percent-encoded once in configure(), and everything that only depends on
+# the catalog once per catalog build by compile_item() and
+# compile_category(), so an order only encodes its own numbers and customer
+# details and joins the pieces. Percent-encoding works
+# per character, so the encoded pieces concatenate to the encoded message
+# and the URL length is known without building it first.
+class OrderMessageRenderer:
+    def __init__(self, template=None, phone="", max_url_length=8000):
+        self.configure(template, phone, max_url_length)
+
+    def configure(self, template=None, phone="", max_url_length=8000):
+        template = template or DEFAULT_TEMPLATE
+        self.template = template
+        self.url = f"https://wa.me/{phone}?text="
+        self.max_url_length = max_url_length
+        self._header = _compile(_parse("header", template["header"]))
+        self._footer = _compile(_parse("footer", template["footer"]))
+        self._more = _compile(_parse("more", template["more"]))
+        self._category = _compile(_parse("category", template["category"]))
+        self._category_end = _compile(_parse("category_end", template["category_end"]))[0][0]
+        self._item = _parse("item", template["item"])
+        self._slots = tuple(token for token in self._item if not isinstance(token, str) and token[0] in LINE_FIELDS)
+
+    def compile_item(self, item):
+        # Encoded text around the per-order fields of one variant's line:
+        # len(self._slots) + 1 strings
+        pieces, current = [], []
+        for token in self._item:
+            if isinstance(token, str):
+                current.append(token)
+            elif token[0] in LINE_FIELDS:
+                pieces.append(quote("".join(current)))
+                current = []
+            else:
+                current.append(_format(token, item[token[0]]))
+        pieces.append(quote("".join(current)))
+        return tuple(pieces)
+
+    def compile_category(self, category_name):
+        return _render(*self._category, {"category": category_name})
+
+    def render_line(self, pieces, quantity, subtotal):
+        return _render(pieces, self._slots, {"quantity": quantity, "subtotal": subtotal})
+
+    def render_url(self, order, items):
+        # order: the ORDER_FIELDS values. items: (variant, quantity, subtotal)
+        # in cart order, variants carrying message_line and message_category
+        # from compile_item() and compile_category().
+        head = self.url + _render(*self._header, order)
+        foot = _render(*self._footer, order)
+
+        # Group the lines under their category, in order of first appearance
+        groups = {}
+        length = len(head) + len(foot)
+        for entry, quantity, subtotal in items:
+            heading = entry["message_category"]
+            line = self.render_line(entry["message_line"], quantity, subtotal)
+            lines = groups.get(heading)
+            if lines is None:
+                lines = groups[heading] = []
+                length += len(heading) + len(self._category_end)
+            lines.append(line)
+            length += len(line)
+
+        if length <= self.max_url_length:
+            parts = [head]
+            for heading, lines in groups.items():
+                parts.append(heading)
+                parts.extend(lines)
+                parts.append(self._category_end)
+            parts.append(foot)
+            return "".join(parts)
+
+        # Too long: keep whole lines while they fit, then say how many are left
+        total = sum(len(lines) for lines in groups.values())
+        budget = self.max_url_length - len(head) - len(foot) - len(_render(*self._more, {"count": total}))
+        parts = [head]
+        kept = 0
+        full = False
+        for heading, lines in groups.items():
+            if len(heading) + len(lines[0]) + len(self._category_end) > budget:
+                break
+            parts.append(heading)
+            budget -= len(heading) + len(self._category_end)
+            for line in lines:
+                if len(line) > budget:
+                    full = True
+                    break
+                parts.append(line)
+                budget -= len(line)
+                kept += 1
+            parts.append(self._category_end)
+            if full:
+                break
+        parts.append(_render(*self._more, {"count": total - kept}))
+        parts.append(foot)
+        return "".join(parts)
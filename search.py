@@ -0,0 +1,184 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+
+# Tokens are lowercase words; Devanagari is kept so Hindi names stay searchable
+TOKEN_RE = re.compile(r"[\w\u0900-\u097F]+")
+
+# Field weights: matches in the service name count most
+FIELD_WEIGHTS = {
+    "name": 8,
+    "variant": 4,
+    "subcategory": 3,
+    "description": 1,
+}
+
+# Score multipliers per kind of term match
+EXACT, PREFIX, FUZZY = 3, 2, 1
+
+MIN_TERM_LENGTH = 2
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def _deletes(token):
+    # All strings one deletion away, used for edit-distance-1 lookups
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+# Inverted index over services for prefix and fuzzy (edit distance 1) search.
+# It is fed the flat catalog entities from catalog.Catalog.entities();
+# update() only re-tokenizes services whose searchable fields changed. With
+# service_ids it only looks at those services (entities then need to hold
+# just them), dropping the ones missing from entities.
+class SearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs = {}          # service id -> {"signature", "tokens", "result"}
+        self._postings = {}      # token -> {service id: weight}
+        self._tokens = []        # sorted vocabulary for prefix lookups
+        self._delete_map = {}    # deletion variant -> set of tokens
+
+    def __len__(self):
+        return len(self._docs)
+
+    def update(self, entities, service_ids=None):
+        subcategories = entities["subcategories"]
+        variants_by_service = {}
+        for variant in entities["variants"].values():
+            variants_by_service.setdefault(variant["service_id"], []).append(variant)
+
+        changed = 0
+        with self._lock:
+            seen = set()
+            for service in entities["services"].values():
+                service_id = service["id"]
+                seen.add(service_id)
+                subcategory = subcategories.get(service["subcategory_id"], {})
+                variants = variants_by_service.get(service_id, [])
+                signature = (
+                    service["name"],
+                    service["description"],
+                    subcategory.get("name"),
+                    subcategory.get("category_id"),
+                    tuple((v["name"], v["price"], v["available"]) for v in variants),
+                )
+                doc = self._docs.get(service_id)
+                if doc is not None and doc["signature"] == signature:
+                    continue
+                if doc is not None:
+                    self._remove(service_id)
+                self._add(service, subcategory, variants, signature)
+                changed += 1
+
+            candidates = self._docs if service_ids is None else [sid for sid in service_ids if sid in self._docs]
+            for service_id in [sid for sid in candidates if sid not in seen]:
+                self._remove(service_id)
+                changed += 1
+        return changed
+
+    def _add(self, service, subcategory, variants, signature):
+        tokens = {}
+        fields = [
+            ("name", service["name"]),
+            ("subcategory", subcategory.get("name")),
+            ("description", service["description"]),
+        ] + [("variant", variant["name"]) for variant in variants]
+        for field, text in fields:
+            for token in tokenize(text):
+                tokens[token] = max(tokens.get(token, 0), FIELD_WEIGHTS[field])
+
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._tokens, token)
+                for variant in _deletes(token):
+                    self._delete_map.setdefault(variant, set()).add(token)
+            postings[service["id"]] = weight
+
+        available = [variant for variant in variants if variant["available"]] or variants
+        self._docs[service["id"]] = {
+            "signature": signature,
+            "tokens": tokens,
+            "result": {
+                "id": service["id"],
+                "name": service["name"],
+                "category_id": subcategory.get("category_id"),
+                "subcategory": subcategory.get("name"),
+                "price": available[0]["price"] if available else None,
+            },
+        }
+
+    def _remove(self, service_id):
+        doc = self._docs.pop(service_id)
+        for token in doc["tokens"]:
+            postings = self._postings[token]
+            postings.pop(service_id, None)
+            if postings:
+                continue
+            del self._postings[token]
+            del self._tokens[bisect_left(self._tokens, token)]
+            for variant in _deletes(token):
+                matches = self._delete_map.get(variant)
+                if matches is not None:
+                    matches.discard(token)
+                    if not matches:
+                        del self._delete_map[variant]
+
+    def _term_matches(self, term):
+        # token -> multiplier for every vocabulary token matching the term
+        matches = {}
+        start = bisect_left(self._tokens, term)
+        for token in self._tokens[start:]:
+            if not token.startswith(term):
+                break
+            matches[token] = EXACT if token == term else PREFIX
+
+        if len(term) >= 3:
+            candidates = set(self._delete_map.get(term, ()))
+            for variant in _deletes(term):
+                if variant in self._postings:
+                    candidates.add(variant)
+                candidates.update(self._delete_map.get(variant, ()))
+            for token in candidates:
+                matches.setdefault(token, FUZZY)
+        return matches
+
+    def search(self, query, limit=10):
+        terms = [term for term in dict.fromkeys(tokenize(query)) if len(term) >= MIN_TERM_LENGTH]
+        if not terms:
+            return []
+
+        scores = {}
+        with self._lock:
+            for term in terms:
+                best = {}
+                for token, multiplier in self._term_matches(term).items():
+                    for service_id, weight in self._postings[token].items():
+                        score = weight * multiplier
+                        if score > best.get(service_id, 0):
+                            best[service_id] = score
+                for service_id, score in best.items():
+                    # Services matching every term always outrank partial matches
+                    total, matched = scores.get(service_id, (0, 0))
+                    scores[service_id] = (total + score, matched + 1)
+
+            phrase = " ".join(terms)
+            ranked = heapq.nsmallest(
+                limit,
+                scores.items(),
+                key=lambda entry: (
+                    -entry[1][1],
+                    -entry[1][0],
+                    phrase not in self._docs[entry[0]]["result"]["name"].lower(),
+                    self._docs[entry[0]]["result"]["price"] or 0,
+                ),
+            )
+            return [
+                dict(self._docs[service_id]["result"], score=total)
+                for service_id, (total, _) in ranked
+            ]
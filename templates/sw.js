@@ -0,0 +1,126 @@
+// Service worker for the storefront, generated by /sw.js.
+// SHELL holds the content-hashed URLs of the page shell, so changing any of
+// them changes this script and the browser installs the new worker.
+const SHELL = {{ shell|tojson }};
+const MANIFEST_URL = {{ manifest_url|tojson }};
+const SHELL_CACHE = 'shell';
+const IMAGE_CACHE = 'images';
+const IMAGE_PATH = /^\/static\/(services|categories)\//;
+
+function cacheKey(url) {
+  url = new URL(url, self.location.origin);
+  return url.pathname + url.search;
+}
+
+// Keep cached shell files whose URL is unchanged; fetch only the new ones
+// (and the page itself, which is not versioned)
+self.addEventListener('install', event => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(SHELL_CACHE);
+    const cached = new Set((await cache.keys()).map(request => cacheKey(request.url)));
+    await cache.addAll(SHELL.filter(url => url === '/' || !cached.has(url)));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil((async () => {
+    const cache = await caches.open(SHELL_CACHE);
+    const shell = new Set(SHELL);
+    for (const request of await cache.keys()) {
+      if (!shell.has(cacheKey(request.url))) {
+        await cache.delete(request);
+      }
+    }
+    await self.clients.claim();
+  })());
+});
+
+// The page posts the catalog version it loaded. Cached images missing from
+// that version's manifest were replaced or removed, so only those are dropped.
+async function syncManifest(version) {
+  const cache = await caches.open(IMAGE_CACHE);
+  const stored = await cache.match(MANIFEST_URL);
+  if (stored && (await stored.json()).version === version) {
+    return;
+  }
+  const response = await fetch(MANIFEST_URL);
+  if (!response.ok) {
+    return;
+  }
+  const manifest = await response.clone().json();
+  const images = new Set(manifest.images);
+  for (const request of await cache.keys()) {
+    const key = cacheKey(request.url);
+    if (key !== MANIFEST_URL && !images.has(key)) {
+      await cache.delete(request);
+    }
+  }
+  await cache.put(MANIFEST_URL, response);
+}
+
+self.addEventListener('message', event => {
+  if (event.data && event.data.type === 'catalog') {
+    event.waitUntil(syncManifest(event.data.version).catch(() => {}));
+  }
+});
+
+// The page: network first, the last copy when offline
+async function networkFirst(request) {
+  const cache = await caches.open(SHELL_CACHE);
+  try {
+    const response = await fetch(request);
+    if (response.ok) {
+      await cache.put('/', response.clone());
+    }
+    return response;
+  } catch (e) {
+    const cached = await cache.match('/');
+    if (cached) {
+      return cached;
+    }
+    throw e;
+  }
+}
+
+// Images: the cached copy at once, refreshed in the background
+async function staleWhileRevalidate(event) {
+  const cache = await caches.open(IMAGE_CACHE);
+  const cached = await cache.match(event.request);
+  const network = fetch(event.request).then(response => {
+    if (response.ok) {
+      return cache.put(event.request, response.clone()).then(() => response);
+    }
+    return response;
+  });
+  if (cached) {
+    event.waitUntil(network.catch(() => {}));
+    return cached;
+  }
+  return network;
+}
+
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) {
+    return;
+  }
+
+  if (request.method === 'POST' && url.pathname === '/submit_order') {
+    // Unreachable: back to the menu, which restores the cart and says so
+    event.respondWith(fetch(request).catch(() => Response.redirect('/?offline=1', 303)));
+    return;
+  }
+  if (request.method !== 'GET') {
+    return;
+  }
+
+  if (request.mode === 'navigate' && url.pathname === '/') {
+    event.respondWith(networkFirst(request));
+  } else if (IMAGE_PATH.test(url.pathname)) {
+    event.respondWith(staleWhileRevalidate(event));
+  } else if (SHELL.includes(cacheKey(url))) {
+    event.respondWith(caches.match(request).then(cached => cached || fetch(request)));
+  }
+});
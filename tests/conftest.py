@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def shop(tmp_path_factory):
+    # The app on a throwaway SQLite database holding the demo catalog. The
+    # app module is global state, so the database is shared by the session.
+    import app as shop
+
+    path = tmp_path_factory.mktemp("db") / "shop.db"
+    shop.create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}"})
+    with shop.app.app_context():
+        shop.init_db()
+        shop.seed_db()
+    return shop
+
+
+@pytest.fixture
+def admin(shop):
+    client = shop.app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+    return client
@@ -0,0 +1,90 @@
+# Catalog coherence across worker processes: an admin edit made through one
+# worker is served by the others within CATALOG_CHECK_INTERVAL plus
+# CATALOG_COALESCE_WINDOW. Each worker is a separate interpreter serving the
+# app on its own port, all sharing one SQLite database.
+import http.cookiejar
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKERS = 3
+CHECK_INTERVAL = 0.2
+COALESCE_WINDOW = 0.3
+# Polling granularity and request latency on top of the configured delay
+SLACK = 0.5
+POLL_INTERVAL = 0.02
+
+SERVE = """
+from werkzeug.serving import make_server
+from app import create_app
+server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+print(server.port, flush=True)
+server.serve_forever()
+"""
+
+
+@pytest.fixture
+def workers(tmp_path):
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + str(tmp_path / "shop.db"),
+        CATALOG_CHECK_INTERVAL=str(CHECK_INTERVAL),
+        CATALOG_COALESCE_WINDOW=str(COALESCE_WINDOW),
+    )
+    subprocess.run([sys.executable, "-m", "flask", "--app", "wsgi", "seed"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    processes = []
+    try:
+        for _ in range(WORKERS):
+            processes.append(subprocess.Popen([sys.executable, "-c", SERVE], cwd=ROOT, env=env,
+                                              stdout=subprocess.PIPE, text=True))
+        yield [f"http://127.0.0.1:{process.stdout.readline().strip()}" for process in processes]
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+            process.stdout.close()
+
+
+def get_catalog(base):
+    with urllib.request.urlopen(base + "/api/catalog") as response:
+        return json.load(response)
+
+
+def variant_price(catalog, variant_id):
+    return next(variant["price"] for variant in catalog["variants"] if variant["id"] == variant_id)
+
+
+def test_admin_edit_reaches_other_workers(workers):
+    admin, *others = workers
+    before = [get_catalog(base) for base in workers]
+    assert len({catalog["version"] for catalog in before}) == 1
+    assert variant_price(before[0], 1) != 4321
+
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    post = lambda path, form: opener.open(admin + path, urllib.parse.urlencode(form).encode())
+    post("/admin", {"username": "admin", "password": "mani7301"})
+    post("/admin/update_variant/1", {"name": "1 Bedroom", "price": "4321", "unit": "per service", "available": "on"})
+    edited = time.monotonic()
+
+    # The worker that made the edit serves it at once
+    after = get_catalog(admin)
+    assert after["version"] > before[0]["version"]
+    assert variant_price(after, 1) == 4321
+
+    deadline = edited + CHECK_INTERVAL + COALESCE_WINDOW + SLACK
+    for base in others:
+        while True:
+            catalog = get_catalog(base)
+            if catalog["version"] == after["version"]:
+                break
+            assert time.monotonic() < deadline, f"{base} still serves version {catalog['version']}"
+            time.sleep(POLL_INTERVAL)
+        assert variant_price(catalog, 1) == 4321
@@ -0,0 +1,142 @@
+# The snapshot patched from the change journal must equal one loaded from
+# scratch, whichever mix of admin edits (made here or by another worker)
+# it has applied.
+import random
+
+import pytest
+
+ROUTE_NAMES = {"categories": "category", "subcategories": "subcategory", "services": "service", "variants": "variant"}
+
+
+def assert_current(shop):
+    with shop.app.app_context():
+        services_data = shop.get_services_data()
+        assert shop._catalog["version"] == shop.current_catalog_version()
+        assert services_data.to_dict() == shop.load_services_data().to_dict()
+
+
+def pick(rng, shop, kind):
+    ids = list(shop.get_services_data().entities()[kind])
+    return rng.choice(ids) if ids else None
+
+
+def route_ids(entities, kind, row_id):
+    # The ids in the URLs of the update/delete routes for a row
+    if kind == "subcategories":
+        return [entities[kind][row_id]["category_id"], row_id]
+    if kind == "services":
+        subcategory_id = entities[kind][row_id]["subcategory_id"]
+        return [entities["subcategories"][subcategory_id]["category_id"], subcategory_id, row_id]
+    return [row_id]
+
+
+def route_edit(rng, shop, admin, step):
+    # One admin edit through its route; returns False if nothing was edited
+    entities = shop.get_services_data().entities()
+    kind = rng.choice(shop.CATALOG_KINDS)
+    action = rng.choices(("add", "update", "delete"), weights=(4, 4, 2))[0]
+    form = {"name": f"Edit {step}"}
+    if kind == "services":
+        form["description"] = f"About {step}"
+    elif kind == "variants":
+        form.update(price=str(rng.randint(10, 500)), unit=rng.choice(("per plate", "per kg")))
+    if kind in ("services", "variants") and rng.random() < 0.7:
+        form["available"] = "on"
+
+    if action == "add" and kind == "categories":
+        url = "/admin/add_category"
+    elif action == "add":
+        parent_kind = shop.CATALOG_KINDS[shop.CATALOG_KINDS.index(kind) - 1]
+        parent_id = pick(rng, shop, parent_kind)
+        if parent_id is None:
+            return False
+        # The add routes take the ids down to the parent, except add_variant
+        ids = [parent_id] if kind == "variants" else route_ids(entities, parent_kind, parent_id)
+        url = f"/admin/add_{ROUTE_NAMES[kind]}/" + "/".join(map(str, ids))
+    else:
+        row_id = pick(rng, shop, kind)
+        if row_id is None:
+            return False
+        url = f"/admin/{action}_{ROUTE_NAMES[kind]}/" + "/".join(map(str, route_ids(entities, kind, row_id)))
+        if action == "delete":
+            form = None
+    response = admin.post(url, data=form) if form is not None else admin.get(url)
+    assert response.status_code == 302, url
+    return True
+
+
+def other_worker_edit(rng, shop, step):
+    # An edit committed as another worker would: journaled with a version
+    # bump, but this worker's snapshot is left behind
+    db = shop.db
+    with shop.app.app_context():
+        variant_id = pick(rng, shop, "variants")
+        service_id = pick(rng, shop, "services")
+        choice = rng.random()
+        if choice < 0.5 and variant_id is not None:
+            db.session.get(shop.Variant, variant_id).price = rng.randint(10, 500)
+        elif choice < 0.8 and service_id is not None:
+            db.session.add(shop.Variant(name=f"Other {step}", price=99, unit="per plate", available=True,
+                                        service_id=service_id))
+        elif service_id is not None:
+            db.session.get(shop.Service, service_id).name = f"Other {step}"
+        shop.journal_catalog()
+        db.session.commit()
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_interleaved_edits_match_a_full_load(shop, admin, seed):
+    rng = random.Random(seed)
+    for step in range(150):
+        if rng.random() < 0.3:
+            other_worker_edit(rng, shop, step)
+            if rng.random() < 0.5:
+                continue
+            # Admin pages catch up at once
+            admin.get("/admin/catalog_changes")
+        elif rng.random() < 0.05:
+            # Bulk statements bypass the ORM and are journaled as a reload
+            variant_id = pick(rng, shop, "variants")
+            if variant_id is None:
+                continue
+            response = admin.post("/admin/bulk_update", json={
+                "changes": [{"target": "variants", "ids": [variant_id], "price": {"set": rng.randint(10, 500)}}]
+            })
+            assert response.status_code == 200, response.get_json()
+        elif not route_edit(rng, shop, admin, step):
+            continue
+        assert_current(shop)
+    admin.get("/admin/catalog_changes")
+    assert_current(shop)
+
+
+def test_added_parent_adopts_stored_rows(shop, admin):
+    # Rows whose parent is missing (left by deletes that bypassed the ORM)
+    # are dropped from the catalog until a row with that id is added
+    db = shop.db
+    with shop.app.app_context():
+        category_id = (db.session.execute(db.select(db.func.max(shop.Category.id))).scalar() or 0) + 1
+        subcategory_id = (db.session.execute(db.select(db.func.max(shop.Subcategory.id))).scalar() or 0) + 1
+        service_id = (db.session.execute(db.select(db.func.max(shop.Service.id))).scalar() or 0) + 1
+        db.session.execute(db.insert(shop.Subcategory).values(id=subcategory_id, name="Orphan", category_id=category_id))
+        db.session.execute(db.insert(shop.Service).values(
+            id=service_id, name="Orphan service", available=True, subcategory_id=subcategory_id
+        ))
+        db.session.execute(db.insert(shop.Variant).values(
+            name="Orphan variant", price=10, unit="per plate", available=True, service_id=service_id
+        ))
+        db.session.commit()
+        since = shop.current_catalog_version()
+    admin.get("/admin/catalog_changes")
+    assert not shop.get_services_data().contains("subcategories", subcategory_id)
+
+    admin.post("/admin/add_category", data={"name": "Adopting"})
+    assert_current(shop)
+    assert shop.get_services_data().service(service_id) is not None
+
+    # A delta from a version older than the kept digests sends them too
+    shop._catalog_history.pop(since, None)
+    delta = admin.get(f"/api/catalog?since={since}").get_json()
+    assert not delta["full"]
+    assert subcategory_id in {row["id"] for row in delta["subcategories"]}
+    assert service_id in {row["id"] for row in delta["services"]}
@@ -1,5 +1,8 @@
 # wsgi.py
-from app import app
+# Run 'flask --app wsgi init-db' once per deploy before starting workers
+from app import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
     app.run()